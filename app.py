@@ -1,80 +1,113 @@
 import streamlit as st
-import pandas as pd
-import numpy as np
-import itertools
-import plotly.express as px
-import json
-from urllib.request import urlopen
+from coefficient_store import load_model
+from scoring import province_frame, province_map_frame
+from canada_geojson import load_geojson, bundle_digest
+import result_cache
+import figure_cache
+import metrics
+from trends import province_rows
+from comparison import comparison_map
+from app_common import (initialize_session_state, calculate_and_store_results, current_results,
+                        show_results_table, show_downloads, show_what_if, show_opportunities, show_comparison)
 
-def load_coefficient_data(csv_path):
-    df = pd.read_csv(csv_path)
-    years = [col for col in df.columns if col.isdigit()]
-    coefficients_by_year = {}
-    for year in years:
-        coefficients = {
-            'Intercept': df[df['Base Category'] == 'Intercept'][year].iloc[0]
-        }
-        for base_category in df['Base Category'].unique():
-            if base_category != 'Intercept':
-                category_data = df[df['Base Category'] == base_category]
-                coefficients[base_category] = dict(zip(category_data['Categories'], 
-                                                     category_data[year]))
-        coefficients_by_year[year] = coefficients
-    return coefficients_by_year
+@st.cache_resource
+def load_canada_geojson():
+    return load_geojson()
 
-def calculate_probability(selected_profile, coefficients_by_year):
-    all_results = []
-    for year, coefficients in coefficients_by_year.items():
-        combinations = list(itertools.product(
-            coefficients['Province'].keys(),
-            coefficients['Quarter'].keys()
-        ))
-        for combo in combinations:
-            logit = coefficients['Intercept']
-            for feature, category in selected_profile.items():
-                logit += coefficients[feature][category]
-            logit += coefficients['Province'][combo[0]]
-            logit += coefficients['Quarter'][combo[1]]
-            probability = np.round((np.exp(logit) / (1 + np.exp(logit))) * 100, 2)
-            all_results.append({
-                'Year': year,
-                'Province': combo[0],
-                'Quarter': combo[1],
-                'Probability': probability
-            })
-    
-    results_df = pd.DataFrame(all_results).sort_values(by=['Year', 'Probability'], ascending=[True, False])
-    return results_df
+@st.cache_resource
+def canada_geojson_digest():
+    return bundle_digest()
 
-def initialize_session_state():
-    if 'results_calculated' not in st.session_state:
-        st.session_state.results_calculated = False
-    if 'results_df' not in st.session_state:
-        st.session_state.results_df = None
-    if 'show_trends' not in st.session_state:
-        st.session_state.show_trends = False
-    if 'selected_year' not in st.session_state:
-        st.session_state.selected_year = 'All'
-    if 'selected_province' not in st.session_state:
-        st.session_state.selected_province = 'All'
-    if 'graph_province' not in st.session_state:
-        st.session_state.graph_province = 'All'
+@st.cache_resource
+def canada_geojson_size():
+    # Every map holds its own copy of the geometry
+    return figure_cache.object_size(load_canada_geojson())
 
-def calculate_and_store_results():
-    st.session_state.results_df = calculate_probability(
-        st.session_state.selected_profile,
-        st.session_state.coefficients_by_year
+def province_choropleth(map_df, canada_geojson, min_prob, max_prob, title):
+    # Plotly is only imported once there is something to plot
+    import plotly.express as px
+
+    fig_choropleth = px.choropleth(
+        map_df,
+        geojson=canada_geojson,
+        locations='Province',
+        featureidkey='properties.name',
+        color='Probability',
+        color_continuous_scale=['red', 'yellow', 'green'],  # Red to Green scale
+        range_color=[min_prob, max_prob],  # Dynamic range based on data
+        labels={'Probability': 'Average Probability (%)'},
+        title=title
     )
-    st.session_state.results_calculated = True
 
-@st.cache_data
-def load_canada_geojson():
-    geojson_url = "https://raw.githubusercontent.com/codeforamerica/click_that_hood/master/public/data/canada.geojson"
-    with urlopen(geojson_url) as response:
-        canada_geojson = json.load(response)
-    return canada_geojson
+    # Update map layout
+    fig_choropleth.update_geos(
+        fitbounds="locations",
+        visible=False,
+    )
+
+    fig_choropleth.update_layout(
+        margin={"r":0,"t":30,"l":0,"b":0},
+        height=500
+    )
+
+    # Update missing values to be transparent
+    fig_choropleth.update_traces(
+        marker_line_color='darkgray',
+        marker_line_width=1,
+        showscale=True
+    )
+
+    return fig_choropleth
+
+def cached_choropleth(map_df, min_prob, max_prob, title):
+    # The figure is only built when the map data or its settings change;
+    # otherwise the cached figure itself is reused. It is shared between
+    # sessions, so it is only ever passed to st.plotly_chart, never modified.
+    # Returns the figure and whether it came from the cache.
+    key = figure_cache.figure_key('choropleth', canada_geojson_digest(), map_df, min_prob, max_prob, title)
+    fig_choropleth = figure_cache.lookup(key)
+    if fig_choropleth is None:
+        with metrics.span('load_geojson'):
+            canada_geojson = load_canada_geojson()
+        fig_choropleth = province_choropleth(map_df, canada_geojson, min_prob, max_prob, title)
+        size = canada_geojson_size() + int(map_df.memory_usage(deep=True).sum())
+        figure_cache.store(key, fig_choropleth, size=size)
+        return fig_choropleth, False
+    return fig_choropleth, True
+
+def draw_comparison_trend(trend_df, compare_province):
+    with metrics.span('comparison_trend_figure'):
+        import plotly.express as px
+
+        fig = px.line(
+            trend_df,
+            x='Period',
+            y='Probability',
+            color='Profile',
+            title=f"Probability Trends by Profile ({compare_province})",
+            labels={"Period": "Year and Quarter", "Probability": "Probability (%)"},
+            category_orders={'Period': list(trend_df['Period'].cat.categories)}
+        )
+        fig.update_xaxes(tickangle=-45)
+    with metrics.span('render_comparison_trend'):
+        st.plotly_chart(fig, use_container_width=True)
+
+def draw_comparison_map(comparison, compare_year):
+    map_profile = st.selectbox("Profile for Map", comparison['names'], key='compare_map_profile')
+    with metrics.span('comparison_map_prep'):
+        means = comparison_map(comparison, map_profile, compare_year)
+        map_df = province_frame(means)
+    with metrics.span('comparison_choropleth_figure') as span:
+        fig_choropleth, span['cache_hit'] = cached_choropleth(
+            map_df, float(means.min()), float(means.max()),
+            f"{map_profile}: Employment Probability by Province {compare_year}"
+        )
+    with metrics.span('render_comparison_map'):
+        st.plotly_chart(fig_choropleth, use_container_width=True)
 
 def main():
+    metrics.start_server()
+    metrics.start_rerun('app')
     st.title("Historical Job Opportunities Recommender")
 
     st.sidebar.title("About the Author")
@@ -93,24 +126,22 @@ def main():
     initialize_session_state()
     
     try:
-        if 'coefficients_by_year' not in st.session_state:
-            st.session_state.coefficients_by_year = load_coefficient_data('Book2.csv')
-        
-        first_year = list(st.session_state.coefficients_by_year.keys())[0]
-        coefficients = st.session_state.coefficients_by_year[first_year]
+        with metrics.span('load_coefficients'):
+            model = load_model('Book2.csv')
+            categories = model['categories']
         
         st.subheader("User Profile")
         col1, col2 = st.columns(2)
         
         with col1:
-            age = st.selectbox("Age", list(coefficients['Age'].keys()), key='age')
-            gender = st.selectbox("Gender", list(coefficients['Gender'].keys()), key='gender')
-            marstat = st.selectbox("Marital Status", list(coefficients['MarStat'].keys()), key='marstat')
+            age = st.selectbox("Age", categories['Age'], key='age')
+            gender = st.selectbox("Gender", categories['Gender'], key='gender')
+            marstat = st.selectbox("Marital Status", categories['MarStat'], key='marstat')
         
         with col2:
-            educ = st.selectbox("Education Level", list(coefficients['Educ'].keys()), key='educ')
-            inmig = st.selectbox("Migration Status", list(coefficients['Inmig'].keys()), key='inmig')
-            noc = st.selectbox("Occupation (NOC)", list(coefficients['NOC'].keys()), key='noc')
+            educ = st.selectbox("Education Level", categories['Educ'], key='educ')
+            inmig = st.selectbox("Migration Status", categories['Inmig'], key='inmig')
+            noc = st.selectbox("Occupation (NOC)", categories['NOC'], key='noc')
         
         st.session_state.selected_profile = {
             'Age': age,
@@ -125,105 +156,40 @@ def main():
             calculate_and_store_results()
         
         if st.session_state.results_calculated:
+            results = current_results()
             st.subheader("Historical Results")
             
-            col1, col2 = st.columns(2)
-            with col1:
-                st.session_state.selected_year = st.selectbox(
-                    "Filter by Year",
-                    ['All'] + sorted(st.session_state.results_df['Year'].unique().tolist()),
-                    key='year_filter'
-                )
-            with col2:
-                st.session_state.selected_province = st.selectbox(
-                    "Filter by Province in Table",
-                    ['All'] + sorted(st.session_state.results_df['Province'].unique().tolist()),
-                    key='province_filter'
-                )
-            
-            filtered_df = st.session_state.results_df.copy()
-            if st.session_state.selected_year != 'All':
-                filtered_df = filtered_df[filtered_df['Year'] == st.session_state.selected_year]
-            if st.session_state.selected_province != 'All':
-                filtered_df = filtered_df[filtered_df['Province'] == st.session_state.selected_province]
-
-            filtered_df_styled = filtered_df[['Year', 'Province', 'Quarter', 'Probability']]
-            st.dataframe(filtered_df_styled.style.format({'Probability': "{:.2f}%"}))
+            show_results_table(results)
+            show_downloads(results)
+            show_what_if(model)
 
             # Choropleth Map Section
             st.subheader("Provincial Employment Probability Map")
             
-            # Calculate average probability by province for choropleth map
-            if st.session_state.selected_year != 'All':
-                map_data = filtered_df[filtered_df['Year'] == st.session_state.selected_year]
-            else:
-                map_data = filtered_df
-
-            # Create a complete list of all Canadian provinces
-            all_provinces = [
-                'Alberta', 'British Columbia', 'Manitoba', 'New Brunswick',
-                'Newfoundland and Labrador', 'Northwest Territories', 'Nova Scotia',
-                'Nunavut', 'Ontario', 'Prince Edward Island', 'Quebec', 'Saskatchewan',
-                'Yukon'
-            ]
-
-            # Calculate averages for provinces with data
-            avg_prob_by_province = map_data.groupby('Province')['Probability'].mean().reset_index()
-            
-            # Create a complete DataFrame with all provinces
-            complete_provinces_df = pd.DataFrame({'Province': all_provinces})
-            avg_prob_by_province = pd.merge(
-                complete_provinces_df,
-                avg_prob_by_province,
-                on='Province',
-                how='left'
-            )
-
-            # Get min and max values for color scale (only from provinces with data)
-            min_prob = avg_prob_by_province['Probability'].min()
-            max_prob = avg_prob_by_province['Probability'].max()
+            # Look up the precomputed average probability by province
+            with metrics.span('map_prep') as span:
+                avg_prob_by_province, (min_prob, max_prob) = province_map_frame(
+                    results,
+                    st.session_state.selected_year,
+                    st.session_state.selected_province
+                )
+                span['rows'] = int(avg_prob_by_province['Probability'].notna().sum())
             
-            # Load GeoJSON data
-            canada_geojson = load_canada_geojson()
-
             # Create choropleth map with updated settings
-            fig_choropleth = px.choropleth(
-                avg_prob_by_province,
-                geojson=canada_geojson,
-                locations='Province',
-                featureidkey='properties.name',
-                color='Probability',
-                color_continuous_scale=['red', 'yellow', 'green'],  # Red to Green scale
-                range_color=[min_prob, max_prob],  # Dynamic range based on data
-                labels={'Probability': 'Average Probability (%)'},
-                title=f"Employment Probability by Province {st.session_state.selected_year}"
-            )
-
-            # Update map layout
-            fig_choropleth.update_geos(
-                fitbounds="locations",
-                visible=False,
-            )
-
-            fig_choropleth.update_layout(
-                margin={"r":0,"t":30,"l":0,"b":0},
-                height=500
-            )
-
-            # Update missing values to be transparent
-            fig_choropleth.update_traces(
-                marker_line_color='darkgray',
-                marker_line_width=1,
-                showscale=True
-            )
+            with metrics.span('choropleth_figure') as span:
+                fig_choropleth, span['cache_hit'] = cached_choropleth(
+                    avg_prob_by_province, min_prob, max_prob,
+                    f"Employment Probability by Province {st.session_state.selected_year}"
+                )
 
             # Display the choropleth map
-            st.plotly_chart(fig_choropleth, use_container_width=True)
+            with metrics.span('render_map'):
+                st.plotly_chart(fig_choropleth, use_container_width=True)
 
             # Trends Graph Section
             st.session_state.graph_province = st.selectbox(
                 "Select Province for Trend Graph",
-                ['All'] + sorted(st.session_state.results_df['Province'].unique().tolist()),
+                ['All'] + results['province_options'],
                 key='graph_province_filter'
             )
 
@@ -234,29 +200,46 @@ def main():
             )
             
             if st.session_state.show_trends:
-                graph_df = st.session_state.results_df.copy()
-                if st.session_state.graph_province != 'All':
-                    graph_df = graph_df[graph_df['Province'] == st.session_state.graph_province]
-                
-                graph_df['Year_Quarter'] = graph_df['Year'] + "-Q" + graph_df['Quarter'].astype(str)
+                with metrics.span('trend_prep') as span:
+                    # Precomputed per result in period order; 'All' may be downsampled
+                    if st.session_state.graph_province == 'All':
+                        graph_df = results['trend_all']
+                    else:
+                        graph_df = province_rows(results['trend'], st.session_state.graph_province)
+                    periods = list(results['trend']['Period'].cat.categories)
+                    span['rows'] = len(graph_df)
                 
-                fig = px.line(
-                    graph_df, 
-                    x='Year_Quarter', 
-                    y='Probability', 
-                    color='Province', 
-                    line_group='Province', 
-                    title="Probability Trends by Province",
-                    labels={"Year_Quarter": "Year and Quarter", "Probability": "Probability (%)"},
-                    markers=False
-                )
-                fig.update_xaxes(tickangle=-45)
-                st.plotly_chart(fig, use_container_width=True)
+                with metrics.span('trend_figure'):
+                    import plotly.express as px
+
+                    fig = px.line(
+                        graph_df, 
+                        x='Period', 
+                        y='Probability', 
+                        color='Province', 
+                        line_group='Province', 
+                        title="Probability Trends by Province",
+                        labels={"Period": "Year and Quarter", "Probability": "Probability (%)"},
+                        category_orders={'Period': periods},
+                        markers=False
+                    )
+                    fig.update_xaxes(tickangle=-45)
+                with metrics.span('render_trend'):
+                    st.plotly_chart(fig, use_container_width=True)
                 
+        show_opportunities(model)
+        show_comparison(model, draw_comparison_trend, draw_comparison_map)
+
     except Exception as e:
         st.error(f"Error loading or processing data: {str(e)}")
         st.write("Please verify that the CSV file is correctly formatted and accessible.")
 
+    with st.sidebar.expander("Result cache"):
+        st.json(result_cache.cache_stats())
+        st.json(figure_cache.cache_stats())
+
+    metrics.end_rerun()
+
     st.markdown("""
     <style>
         .footer {
@@ -1,98 +1,34 @@
 import streamlit as st
-import pandas as pd
-import numpy as np
-import itertools
-import altair as alt
+from coefficient_store import load_model
+import result_cache
+import metrics
+from trends import province_rows
+from app_common import (initialize_session_state, calculate_and_store_results, current_results,
+                        show_results_table, show_downloads, show_what_if, show_opportunities, show_comparison)
 
-def load_coefficient_data(csv_path):
+def draw_comparison_trend(trend_df, compare_province):
     """
-    Loads and structures coefficients from the CSV file.
-    Returns a dictionary of dictionaries by year.
+    Draws the trends of the compared profiles as an Altair chart.
     """
-    df = pd.read_csv(csv_path)
-    
-    years = [col for col in df.columns if col.isdigit()]
-    coefficients_by_year = {}
-    
-    for year in years:
-        coefficients = {
-            'Intercept': df[df['Base Category'] == 'Intercept'][year].iloc[0]
-        }
-        
-        for base_category in df['Base Category'].unique():
-            if base_category != 'Intercept':
-                category_data = df[df['Base Category'] == base_category]
-                coefficients[base_category] = dict(zip(category_data['Categories'], 
-                                                     category_data[year]))
-        
-        coefficients_by_year[year] = coefficients
-    
-    return coefficients_by_year
+    with metrics.span('comparison_trend_figure'):
+        import altair as alt
 
-def calculate_probability(selected_profile, coefficients_by_year):
-    """
-    Calculates probabilities for all years, provinces, and quarters.
-    """
-    all_results = []
-    
-    for year, coefficients in coefficients_by_year.items():
-        combinations = list(itertools.product(
-            coefficients['Province'].keys(),
-            coefficients['Quarter'].keys()
-        ))
-        
-        for combo in combinations:
-            logit = coefficients['Intercept']
-            
-            for feature, category in selected_profile.items():
-                logit += coefficients[feature][category]
-            
-            logit += coefficients['Province'][combo[0]]
-            logit += coefficients['Quarter'][combo[1]]
-            
-            probability = np.round((np.exp(logit) / (1 + np.exp(logit))) * 100, 2)
-            
-            all_results.append({
-                'Year': year,
-                'Province': combo[0],
-                'Quarter': combo[1],
-                'Probability': probability
-            })
-    
-    results_df = pd.DataFrame(all_results).sort_values(
-        by=['Year', 'Probability'], 
-        ascending=[True, False]
-    )
-    return results_df
-
-def initialize_session_state():
-    """
-    Initializes session state if it does not exist.
-    """
-    if 'results_calculated' not in st.session_state:
-        st.session_state.results_calculated = False
-    if 'results_df' not in st.session_state:
-        st.session_state.results_df = None
-    if 'show_trends' not in st.session_state:
-        st.session_state.show_trends = False
-    if 'selected_year' not in st.session_state:
-        st.session_state.selected_year = 'All'
-    if 'selected_province' not in st.session_state:
-        st.session_state.selected_province = 'All'
-    if 'graph_province' not in st.session_state:
-        st.session_state.graph_province = 'All'
-
-def calculate_and_store_results():
-    """
-    Calculates the results and stores them in session state.
-    """
-    st.session_state.results_df = calculate_probability(
-        st.session_state.selected_profile,
-        st.session_state.coefficients_by_year
-    )
-    st.session_state.results_calculated = True
+        chart = alt.Chart(trend_df).mark_line().encode(
+            x=alt.X('Period:O', title="Year and Quarter", sort=list(trend_df['Period'].cat.categories)),
+            y=alt.Y('Probability:Q', title="Probability (%)"),
+            color='Profile:N',
+            tooltip=['Profile', 'Year', 'Quarter', 'Probability']
+        ).properties(
+            title=f"Probability Trends by Profile ({compare_province})"
+        ).configure_axis(
+            labelAngle=-45
+        )
+    with metrics.span('render_comparison_trend'):
+        st.altair_chart(chart, use_container_width=True)
 
 def main():
+    metrics.start_server()
+    metrics.start_rerun('app2')
     st.title("Historical Job Opportunities Recommender")
 
     st.sidebar.title("About the Author")
@@ -108,24 +44,22 @@ def main():
     initialize_session_state()
     
     try:
-        if 'coefficients_by_year' not in st.session_state:
-            st.session_state.coefficients_by_year = load_coefficient_data('Book2.csv')
-        
-        first_year = list(st.session_state.coefficients_by_year.keys())[0]
-        coefficients = st.session_state.coefficients_by_year[first_year]
+        with metrics.span('load_coefficients'):
+            model = load_model('Book2.csv')
+            categories = model['categories']
         
         st.subheader("User Profile")
         col1, col2 = st.columns(2)
         
         with col1:
-            age = st.selectbox("Age", list(coefficients['Age'].keys()), key='age')
-            gender = st.selectbox("Gender", list(coefficients['Gender'].keys()), key='gender')
-            marstat = st.selectbox("Marital Status", list(coefficients['MarStat'].keys()), key='marstat')
+            age = st.selectbox("Age", categories['Age'], key='age')
+            gender = st.selectbox("Gender", categories['Gender'], key='gender')
+            marstat = st.selectbox("Marital Status", categories['MarStat'], key='marstat')
         
         with col2:
-            educ = st.selectbox("Education Level", list(coefficients['Educ'].keys()), key='educ')
-            inmig = st.selectbox("Migration Status", list(coefficients['Inmig'].keys()), key='inmig')
-            noc = st.selectbox("Occupation (NOC)", list(coefficients['NOC'].keys()), key='noc')
+            educ = st.selectbox("Education Level", categories['Educ'], key='educ')
+            inmig = st.selectbox("Migration Status", categories['Inmig'], key='inmig')
+            noc = st.selectbox("Occupation (NOC)", categories['NOC'], key='noc')
         
         st.session_state.selected_profile = {
             'Age': age,
@@ -140,34 +74,16 @@ def main():
             calculate_and_store_results()
         
         if st.session_state.results_calculated:
+            results = current_results()
             st.subheader("Historical Results")
             
-            col1, col2 = st.columns(2)
-            with col1:
-                st.session_state.selected_year = st.selectbox(
-                    "Filter by Year",
-                    ['All'] + sorted(st.session_state.results_df['Year'].unique().tolist()),
-                    key='year_filter'
-                )
-            with col2:
-                st.session_state.selected_province = st.selectbox(
-                    "Filter by Province in Table",
-                    ['All'] + sorted(st.session_state.results_df['Province'].unique().tolist()),
-                    key='province_filter'
-                )
-            
-            filtered_df = st.session_state.results_df.copy()
-            if st.session_state.selected_year != 'All':
-                filtered_df = filtered_df[filtered_df['Year'] == st.session_state.selected_year]
-            if st.session_state.selected_province != 'All':
-                filtered_df = filtered_df[filtered_df['Province'] == st.session_state.selected_province]
-
-            filtered_df_styled = filtered_df[['Year', 'Province', 'Quarter', 'Probability']]
-            st.dataframe(filtered_df_styled.style.format({'Probability': "{:.2f}%"}))
+            show_results_table(results)
+            show_downloads(results)
+            show_what_if(model)
 
             st.session_state.graph_province = st.selectbox(
                 "Select Province for Graph",
-                ['All'] + sorted(st.session_state.results_df['Province'].unique().tolist()),
+                ['All'] + results['province_options'],
                 key='graph_province_filter'
             )
 
@@ -178,31 +94,46 @@ def main():
             )
             
             if st.session_state.show_trends:
-                graph_df = st.session_state.results_df.copy()
-                if st.session_state.graph_province != 'All':
-                    graph_df = graph_df[graph_df['Province'] == st.session_state.graph_province]
-                
-                # Combine Year and Quarter for X-axis display
-                graph_df['Year_Quarter'] = graph_df['Year'] + "-Q" + graph_df['Quarter'].astype(str)
+                with metrics.span('trend_prep') as span:
+                    # Precomputed per result in period order; 'All' may be downsampled
+                    if st.session_state.graph_province == 'All':
+                        graph_df = results['trend_all']
+                    else:
+                        graph_df = province_rows(results['trend'], st.session_state.graph_province)
+                    periods = list(results['trend']['Period'].cat.categories)
+                    span['rows'] = len(graph_df)
                 
                 # Define the Altair chart
-                chart = alt.Chart(graph_df).mark_line().encode(
-                    x=alt.X('Year_Quarter:O', title="Year and Quarter"),
-                    y=alt.Y('Probability:Q', title="Probability (%)"),
-                    color='Province:N',
-                    tooltip=['Year', 'Quarter', 'Province', 'Probability']
-                ).properties(
-                    title="Probability Trends by Province"
-                ).configure_axis(
-                    labelAngle=-45  # Optional: Rotate labels for better readability
-                )
+                with metrics.span('trend_figure'):
+                    # Altair is only imported when the trends graph is shown
+                    import altair as alt
+
+                    chart = alt.Chart(graph_df).mark_line().encode(
+                        x=alt.X('Period:O', title="Year and Quarter", sort=periods),
+                        y=alt.Y('Probability:Q', title="Probability (%)"),
+                        color='Province:N',
+                        tooltip=['Year', 'Quarter', 'Province', 'Probability']
+                    ).properties(
+                        title="Probability Trends by Province"
+                    ).configure_axis(
+                        labelAngle=-45  # Optional: Rotate labels for better readability
+                    )
                 
-                st.altair_chart(chart, use_container_width=True)
+                with metrics.span('render_trend'):
+                    st.altair_chart(chart, use_container_width=True)
                 
+        show_opportunities(model)
+        show_comparison(model, draw_comparison_trend)
+
     except Exception as e:
         st.error(f"Error loading or processing data: {str(e)}")
         st.write("Please verify that the CSV file is correctly formatted and accessible.")
 
+    with st.sidebar.expander("Result cache"):
+        st.json(result_cache.cache_stats())
+
+    metrics.end_rerun()
+
     st.markdown("""
     <style>
         .footer {
@@ -0,0 +1,340 @@
+import streamlit as st
+from coefficient_store import load_model
+from scoring import FEATURES, score_profile, build_results
+from cube import load_cube_for, lookup_profile
+import result_cache
+import metrics
+from results_table import SORT_OPTIONS, PAGE_SIZES, select_rows, page_count, table_page
+from opportunities import SEARCH_FEATURES, top_combinations
+from sensitivity import sensitivity_grid, sensitivity_summary
+from comparison import MAX_PROFILES, read_profiles, compare_profiles, comparison_summary, comparison_trend
+
+# State and sections shared by app.py and app2.py, which differ only in how
+# they draw their charts.
+
+def initialize_session_state():
+    """
+    Initializes session state if it does not exist.
+    """
+    if 'results_calculated' not in st.session_state:
+        st.session_state.results_calculated = False
+    if 'results_key' not in st.session_state:
+        st.session_state.results_key = None
+    if 'show_trends' not in st.session_state:
+        st.session_state.show_trends = False
+    if 'selected_year' not in st.session_state:
+        st.session_state.selected_year = 'All'
+    if 'selected_province' not in st.session_state:
+        st.session_state.selected_province = 'All'
+    if 'graph_province' not in st.session_state:
+        st.session_state.graph_province = 'All'
+    if 'table_page' not in st.session_state:
+        st.session_state.table_page = 1
+    if 'comparison_profiles' not in st.session_state:
+        st.session_state.comparison_profiles = []
+    if 'profiles_upload_id' not in st.session_state:
+        st.session_state.profiles_upload_id = None
+
+@st.cache_resource
+def load_probability_cube(source_sha256):
+    """
+    Memory-maps the precomputed probability cube once per process.
+    Returns None when the cube is missing or out of date.
+    """
+    return load_cube_for(source_sha256)
+
+def compute_results(selected_profile):
+    """
+    Scores a profile, reading it from the probability cube when available.
+    """
+    model = load_model('Book2.csv')
+    cube = load_probability_cube(model['source_sha256'])
+    if cube is not None:
+        probabilities = lookup_profile(cube, selected_profile)
+    else:
+        probabilities = score_profile(model, selected_profile)
+    return build_results(model, probabilities)
+
+def current_results():
+    """
+    Returns the shared, read-only results for the profile of this session.
+    """
+    key = st.session_state.results_key
+    with metrics.span('result_lookup') as span:
+        results = result_cache.lookup(key)
+        span['cache_hit'] = results is not None
+    if results is None:
+        with metrics.span('calculate_probability') as span:
+            results = result_cache.store(key, compute_results(dict(zip(FEATURES, key[1:]))))
+            span['rows'] = len(results['table'])
+    return results
+
+def results_arrow(results):
+    """
+    Returns the shared Arrow table of this session's results, built once per profile.
+    """
+    # Arrow is only imported once the results are exported
+    from arrow_results import arrow_table
+
+    model = load_model('Book2.csv')
+    return result_cache.get_or_compute(
+        ('arrow',) + st.session_state.results_key,
+        lambda: arrow_table(model, results['probabilities'])
+    )
+
+def calculate_and_store_results():
+    """
+    Calculates the results and stores a reference to them in session state.
+    """
+    model = load_model('Book2.csv')
+    st.session_state.results_key = result_cache.profile_key(model, st.session_state.selected_profile)
+    current_results()
+    st.session_state.results_calculated = True
+
+def add_comparison_profile(selected_profile):
+    """
+    Adds a copy of the selected profile to the profiles being compared.
+    """
+    profiles = st.session_state.comparison_profiles
+    if len(profiles) >= MAX_PROFILES:
+        st.warning(f"At most {MAX_PROFILES} profiles can be compared.")
+        return
+    st.session_state.comparison_profiles = profiles + [(f"Profile {len(profiles) + 1}", dict(selected_profile))]
+
+def comparison_results():
+    """
+    Returns the shared results of the compared profiles, all scored in one call.
+    """
+    model = load_model('Book2.csv')
+    named_profiles = st.session_state.comparison_profiles
+    key = ('comparison', model['source_sha256']) + tuple(
+        (name,) + tuple(profile[f] for f in FEATURES) for name, profile in named_profiles
+    )
+    return result_cache.get_or_compute(key, lambda: compare_profiles(model, named_profiles))
+
+def show_results_table(results):
+    """
+    Shows the year and province filters and one page of the filtered results.
+    """
+    col1, col2 = st.columns(2)
+    with col1:
+        st.session_state.selected_year = st.selectbox(
+            "Filter by Year",
+            ['All'] + results['year_options'],
+            key='year_filter'
+        )
+    with col2:
+        st.session_state.selected_province = st.selectbox(
+            "Filter by Province in Table",
+            ['All'] + results['province_options'],
+            key='province_filter'
+        )
+
+    with metrics.span('filter_table') as span:
+        filtered_rows = select_rows(
+            results['table_index'],
+            st.session_state.selected_year,
+            st.session_state.selected_province
+        )
+        span['rows'] = len(filtered_rows)
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        sort_option = st.selectbox("Sort Table by", list(SORT_OPTIONS), key='table_sort')
+    with col2:
+        page_size = st.selectbox("Rows per Page", PAGE_SIZES, key='table_page_size')
+    n_pages = page_count(len(filtered_rows), page_size)
+    if st.session_state.table_page > n_pages:
+        st.session_state.table_page = 1
+    with col3:
+        page_number = st.number_input("Page", min_value=1, max_value=n_pages, step=1, key='table_page')
+
+    # Only the visible page is sent to the browser
+    with metrics.span('table_page') as span:
+        page_df = table_page(filtered_rows, sort_option, page_number, page_size)
+        span['rows'] = len(page_df)
+    with metrics.span('render_table'):
+        st.dataframe(
+            page_df,
+            column_config={
+                'Probability': st.column_config.NumberColumn("Probability", format="%.2f%%")
+            },
+            hide_index=True
+        )
+    st.caption(f"Page {page_number} of {n_pages} ({len(filtered_rows)} rows)")
+
+def show_downloads(results):
+    """
+    Shows the Parquet and Arrow IPC downloads of the filtered rows.
+    """
+    # Downloads of the filtered rows are slices of the Arrow table,
+    # serialized only when a button is clicked
+    with metrics.span('export_slice') as span:
+        from arrow_results import select_slice, parquet_bytes, ipc_bytes
+
+        export_table = select_slice(
+            results_arrow(results),
+            st.session_state.selected_year,
+            st.session_state.selected_province
+        )
+        span['rows'] = export_table.num_rows
+    file_stem = f"probabilities_{st.session_state.selected_year}_{st.session_state.selected_province}".replace(' ', '_')
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button(
+            "Download Parquet",
+            lambda: parquet_bytes(export_table),
+            file_name=f"{file_stem}.parquet",
+            mime='application/vnd.apache.parquet',
+            on_click='ignore',
+            key='download_parquet'
+        )
+    with col2:
+        st.download_button(
+            "Download Arrow IPC",
+            lambda: ipc_bytes(export_table),
+            file_name=f"{file_stem}.arrow",
+            mime='application/vnd.apache.arrow.file',
+            on_click='ignore',
+            key='download_ipc'
+        )
+
+def show_what_if(model):
+    """
+    Shows how the probability changes when one attribute of the profile does.
+    """
+    st.subheader("What-if Analysis")
+    with metrics.span('sensitivity') as span:
+        key = st.session_state.results_key
+        grid = result_cache.get_or_compute(
+            ('sensitivity',) + key,
+            lambda: sensitivity_grid(model, dict(zip(FEATURES, key[1:])))
+        )
+        sensitivity_df = sensitivity_summary(
+            grid,
+            st.session_state.selected_year,
+            st.session_state.selected_province
+        )
+        span['rows'] = len(sensitivity_df)
+    st.dataframe(
+        sensitivity_df,
+        column_config={
+            'Current': st.column_config.CheckboxColumn("Current"),
+            'Probability': st.column_config.NumberColumn("Probability", format="%.2f%%"),
+            'Change': st.column_config.NumberColumn("Change", format="%+.2f pp")
+        },
+        hide_index=True
+    )
+    st.caption("Average probability if only that attribute of the profile changed, "
+               "for the year and province selected above.")
+
+def show_opportunities(model):
+    """
+    Shows the best combinations of the attributes chosen to search over.
+    """
+    st.subheader("Best Opportunities")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        free_features = st.multiselect(
+            "Search over",
+            SEARCH_FEATURES,
+            default=['NOC', 'Province', 'Quarter'],
+            key='search_free'
+        )
+    with col2:
+        search_year = st.selectbox("Year", ['All'] + sorted(model['years']), key='search_year')
+    with col3:
+        top_k = st.number_input("Combinations", min_value=1, max_value=100, value=10, step=1, key='search_k')
+    st.caption("Attributes not searched over keep the profile's value; Province and Quarter are averaged "
+               "unless searched over, and 'All' averages over the years.")
+
+    with metrics.span('opportunity_search') as span:
+        # Searches run on every rerun of the page, so their results are
+        # cached like the profile's own results.
+        profile = st.session_state.selected_profile
+        free = tuple(feature for feature in SEARCH_FEATURES if feature in free_features)
+        try:
+            top_df = result_cache.get_or_compute(
+                ('opportunities',) + result_cache.profile_key(model, profile) + (free, search_year, top_k),
+                lambda: top_combinations(model, profile, free, search_year, top_k)
+            )
+        except ValueError as e:
+            top_df = None
+            st.warning(str(e))
+        span['rows'] = 0 if top_df is None else len(top_df)
+    if top_df is None:
+        return
+    st.dataframe(
+        top_df,
+        column_config={
+            'Probability': st.column_config.NumberColumn("Probability", format="%.2f%%")
+        },
+        hide_index=True
+    )
+
+def show_comparison(model, draw_trend, draw_map=None):
+    """
+    Shows the profile comparison: the profiles being compared, their summary
+    and their trends. draw_trend(trend_df, province) draws the trends graph
+    and draw_map(comparison, year), if given, a map of one profile.
+    """
+    st.subheader("Compare Profiles")
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("Add Current Profile", key='add_profile'):
+            add_comparison_profile(st.session_state.selected_profile)
+    with col2:
+        if st.button("Clear Profiles", key='clear_profiles'):
+            st.session_state.comparison_profiles = []
+
+    uploaded = st.file_uploader(
+        "Or upload profiles (CSV with Age, Gender, MarStat, Educ, Inmig, NOC and an optional Profile column)",
+        type='csv',
+        key='profiles_upload'
+    )
+    if uploaded is not None and uploaded.file_id != st.session_state.profiles_upload_id:
+        st.session_state.profiles_upload_id = uploaded.file_id
+        try:
+            st.session_state.comparison_profiles = read_profiles(uploaded, model)
+        except ValueError as e:
+            st.error(str(e))
+
+    if not st.session_state.comparison_profiles:
+        return
+    comparison = comparison_results()
+
+    col1, col2 = st.columns(2)
+    with col1:
+        compare_year = st.selectbox("Year", ['All'] + sorted(model['years']), key='compare_year')
+    with col2:
+        compare_province = st.selectbox(
+            "Province",
+            ['All'] + sorted(model['categories']['Province']),
+            key='compare_province'
+        )
+
+    with metrics.span('comparison_summary') as span:
+        summary_df = comparison_summary(comparison, compare_year, compare_province)
+        span['rows'] = len(summary_df)
+    st.dataframe(
+        summary_df,
+        column_config={
+            column: st.column_config.NumberColumn(column, format="%.2f%%")
+            for column in ['Mean Probability', 'Min', 'Max']
+        },
+        hide_index=True
+    )
+
+    compare_names = st.multiselect(
+        "Profiles in Graph",
+        comparison['names'],
+        default=comparison['names'],
+        key='compare_names'
+    )
+    with metrics.span('comparison_trend_prep') as span:
+        trend_df = comparison_trend(comparison, compare_province, compare_names)
+        span['rows'] = len(trend_df)
+    draw_trend(trend_df, compare_province)
+
+    if draw_map is not None:
+        draw_map(comparison, compare_year)
@@ -0,0 +1,136 @@
+import argparse
+import json
+import sys
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from coefficient_store import load_model
+from scoring import FEATURES, score_profile
+
+IPC_SUFFIXES = ('.arrow', '.feather', '.ipc')
+
+
+def _dictionary_column(codes, labels):
+    index_type = np.int8 if len(labels) <= np.iinfo(np.int8).max else np.int16
+    return pa.DictionaryArray.from_arrays(pa.array(codes.astype(index_type)), pa.array(labels, pa.string()))
+
+
+def arrow_table(model, probabilities, metadata=None):
+    """
+    Lays out a (years, provinces, quarters) probability tensor as an Arrow
+    table with dictionary-encoded Year, Province and Quarter columns. Rows
+    are ordered by year, province (both sorted) and quarter, so every year,
+    and every province within a year, is a contiguous block of rows.
+    metadata (a dict of strings) is stored in the schema.
+    """
+    year_order = np.argsort(model['years'], kind='stable')
+    province_order = np.argsort(model['categories']['Province'], kind='stable')
+    years = [model['years'][i] for i in year_order]
+    provinces = [model['categories']['Province'][i] for i in province_order]
+    quarters = model['categories']['Quarter']
+    n_years, n_provinces, n_quarters = len(years), len(provinces), len(quarters)
+
+    values = probabilities[year_order][:, province_order].reshape(-1)
+    table = pa.table({
+        'Year': _dictionary_column(np.repeat(np.arange(n_years), n_provinces * n_quarters), years),
+        'Province': _dictionary_column(np.tile(np.repeat(np.arange(n_provinces), n_quarters), n_years), provinces),
+        'Quarter': _dictionary_column(np.tile(np.arange(n_quarters), n_years * n_provinces), quarters),
+        'Probability': pa.array(values, pa.float64()),
+    })
+    schema_metadata = {'source_sha256': model.get('source_sha256', '')}
+    schema_metadata.update(metadata or {})
+    return table.replace_schema_metadata(schema_metadata)
+
+
+def _labels(table, column):
+    return table.column(column).chunk(0).dictionary.to_pylist()
+
+
+def select_slice(table, year='All', province='All'):
+    """
+    Returns the rows of a table from arrow_table for a year and province,
+    where 'All' leaves that level unfiltered. The result shares the buffers
+    of the table: a single year, or a year and province, is one slice, and
+    one province over every year is a table of one slice per year.
+    """
+    if year == 'All' and province == 'All':
+        return table
+    n_provinces = len(_labels(table, 'Province'))
+    n_quarters = len(_labels(table, 'Quarter'))
+    block = n_provinces * n_quarters
+
+    if province == 'All':
+        y = _labels(table, 'Year').index(year)
+        return table.slice(y * block, block)
+    p = _labels(table, 'Province').index(province)
+    if year != 'All':
+        y = _labels(table, 'Year').index(year)
+        return table.slice(y * block + p * n_quarters, n_quarters)
+    n_years = len(_labels(table, 'Year'))
+    return pa.concat_tables([table.slice(y * block + p * n_quarters, n_quarters) for y in range(n_years)])
+
+
+def parquet_bytes(table):
+    sink = pa.BufferOutputStream()
+    pq.write_table(table, sink, compression='zstd')
+    return sink.getvalue().to_pybytes()
+
+
+def ipc_bytes(table):
+    """
+    Serializes a table in the Arrow IPC file format (readable with
+    pyarrow.ipc.open_file or pandas.read_feather).
+    """
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def write_results(table, path):
+    """
+    Writes a table as Arrow IPC when path ends in .arrow, .feather or .ipc,
+    and as Parquet otherwise.
+    """
+    data = ipc_bytes(table) if path.lower().endswith(IPC_SUFFIXES) else parquet_bytes(table)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def profile_results(selected_profile, csv_path='Book2.csv', year='All', province='All'):
+    """
+    Scores a profile and returns its results as an Arrow table, filtered to a
+    year and province like the apps' table. The profile is stored in the
+    schema metadata.
+    """
+    model = load_model(csv_path)
+    table = arrow_table(model, score_profile(model, selected_profile),
+                        {'profile': json.dumps({f: selected_profile[f] for f in FEATURES})})
+    return select_slice(table, year, province)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the results of one profile as Parquet or Arrow IPC.")
+    parser.add_argument('output', help="Output file (.parquet, or .arrow/.feather/.ipc for Arrow IPC)")
+    for feature in FEATURES:
+        parser.add_argument(f'--{feature.lower()}', dest=feature, required=True)
+    parser.add_argument('--coefficients', default='Book2.csv')
+    parser.add_argument('--year', default='All')
+    parser.add_argument('--province', default='All')
+    args = parser.parse_args(argv)
+
+    selected_profile = {feature: getattr(args, feature) for feature in FEATURES}
+    try:
+        table = profile_results(selected_profile, args.coefficients, args.year, args.province)
+    except (KeyError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    write_results(table, args.output)
+    print(f"Wrote {table.num_rows} rows to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
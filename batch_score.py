@@ -0,0 +1,164 @@
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from coefficient_store import load_model
+from scoring import FEATURES, encode_column, score_rows
+
+GRID_COLUMNS = ['Year', 'Province', 'Quarter']
+
+_worker_model = None
+
+
+DEFAULT_CHUNK_ROWS = 1_000_000
+
+
+def input_columns(input_path):
+    if input_path.endswith('.parquet'):
+        return pq.ParquetFile(input_path).schema_arrow.names
+    return pd.read_csv(input_path, nrows=0).columns.tolist()
+
+
+def read_chunks(input_path, chunk_size):
+    """
+    Yields the input file as DataFrames of at most chunk_size rows.
+    Parquet files are read batch by batch; anything else is read as CSV.
+    """
+    if input_path.endswith('.parquet'):
+        for batch in pq.ParquetFile(input_path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(input_path, chunksize=chunk_size)
+
+
+def column_labels(model, column):
+    return model['years'] if column == 'Year' else model['categories'][column]
+
+
+def grid_shape(model, columns):
+    """
+    Returns the Year, Province and Quarter columns missing from columns and
+    the number of output rows each input profile expands into.
+    """
+    missing = [c for c in GRID_COLUMNS if c not in columns]
+    return missing, int(np.prod([len(column_labels(model, c)) for c in missing]))
+
+
+def score_chunk(model, chunk):
+    """
+    Scores a chunk of profiles. Rows without Year, Province or Quarter are
+    crossed with every value of the missing columns, the same combinations
+    calculate_probability returns. The grid is expanded on integer codes and
+    the feature columns come back as categoricals over the model's labels,
+    so an output row holds a few small integers rather than repeated strings.
+    """
+    missing = [c for c in FEATURES if c not in chunk.columns]
+    if missing:
+        raise ValueError(f"Input is missing columns: {', '.join(missing)}")
+    chunk = chunk.reset_index(drop=True)
+    grid, n_grid = grid_shape(model, chunk.columns)
+    codes = {c: encode_column(model, c, chunk[c]) for c in FEATURES + GRID_COLUMNS if c in chunk.columns}
+
+    rows = np.repeat(np.arange(len(chunk)), n_grid)
+    if grid:
+        codes = {c: values[rows] for c, values in codes.items()}
+        sizes = [len(column_labels(model, c)) for c in grid]
+        for c, values in zip(grid, np.unravel_index(np.arange(n_grid), sizes)):
+            codes[c] = np.tile(values, len(chunk))
+
+    scored = pd.DataFrame({
+        c: pd.Categorical.from_codes(codes[c], column_labels(model, c)) if c in codes
+        else chunk[c].take(rows).reset_index(drop=True)
+        for c in chunk.columns.tolist() + grid
+    })
+    scored['Probability'] = score_rows(model, codes)
+    return scored
+
+
+def _init_worker(csv_path):
+    global _worker_model
+    _worker_model = load_model(csv_path)
+
+
+def _score_in_worker(chunk):
+    return score_chunk(_worker_model, chunk)
+
+
+def score_file(input_path, output_path, csv_path='Book2.csv', chunk_size=DEFAULT_CHUNK_ROWS, workers=None):
+    """
+    Scores every profile in input_path and streams the results to a Parquet
+    file. chunk_size counts output rows: profiles are read in chunks that
+    expand into at most that many rows, and at most two chunks per worker are
+    in flight, so memory stays bounded regardless of the input size.
+    Returns (input rows, output rows, seconds).
+    """
+    workers = workers or os.cpu_count()
+    start = time.perf_counter()
+    # Compile the coefficient store here, once, so that the workers only ever
+    # read an existing store.
+    model = load_model(csv_path)
+    _, n_grid = grid_shape(model, input_columns(input_path))
+    profiles_per_chunk = max(1, chunk_size // n_grid)
+    rows_in = rows_out = 0
+    writer = None
+
+    def write(scored):
+        nonlocal writer, rows_out
+        table = pa.Table.from_pandas(scored, preserve_index=False)
+        if writer is None:
+            writer = pq.ParquetWriter(output_path, table.schema)
+        writer.write_table(table.cast(writer.schema))
+        rows_out += len(scored)
+
+    try:
+        if workers == 1:
+            for chunk in read_chunks(input_path, profiles_per_chunk):
+                rows_in += len(chunk)
+                write(score_chunk(model, chunk))
+        else:
+            with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(csv_path,)) as pool:
+                pending = deque()
+                for chunk in read_chunks(input_path, profiles_per_chunk):
+                    rows_in += len(chunk)
+                    pending.append(pool.submit(_score_in_worker, chunk))
+                    if len(pending) >= 2 * workers:
+                        write(pending.popleft().result())
+                while pending:
+                    write(pending.popleft().result())
+    finally:
+        if writer is not None:
+            writer.close()
+
+    return rows_in, rows_out, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a CSV or Parquet file of profiles.")
+    parser.add_argument('input_path', help="CSV or .parquet file with Age, Gender, MarStat, Educ, "
+                                           "Inmig, NOC and optionally Year, Province, Quarter")
+    parser.add_argument('output_path', help="Parquet file to write")
+    parser.add_argument('--coefficients', default='Book2.csv')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_ROWS,
+                        help="Output rows per chunk; profiles expand into one row per "
+                             "missing Year, Province and Quarter")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Number of worker processes (default: all cores, 1 disables the pool)")
+    args = parser.parse_args()
+
+    rows_in, rows_out, seconds = score_file(args.input_path, args.output_path, args.coefficients,
+                                            args.chunk_size, args.workers)
+    print(f"Scored {rows_in:,} profiles into {rows_out:,} rows in {seconds:.2f}s "
+          f"({rows_in / seconds:,.0f} profiles/s, {rows_out / seconds:,.0f} rows/s)",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+import pandas as pd
+
+import coefficient_store
+from coefficient_store import compile_coefficients, load_model
+from results_table import select_rows, table_page
+from trends import province_rows
+from scoring import FEATURES, load_coefficient_data, score_profile, build_results, province_map_frame
+
+BASELINE_PATH = 'benchmark_baseline.json'
+# Slowdowns smaller than this are timer and scheduler noise, whatever the ratio
+NOISE_FLOOR_SECONDS = 0.001
+# Stages that look slower are timed again this many times; the best run counts
+CONFIRM_RUNS = 2
+
+DATASETS = {
+    'book2': None,
+    'scaled': {'n_years': 50, 'category_factor': 4, 'monthly': True},
+}
+
+
+def synthetic_coefficients(csv_path, output_path, n_years=50, category_factor=4, monthly=True, seed=0):
+    """
+    Writes a coefficient table shaped like Book2.csv but larger: n_years
+    year columns, every profile feature with category_factor times as many
+    categories and, if monthly, twelve periods (M01-M12) instead of quarters.
+    """
+    rng = np.random.default_rng(seed)
+    df = pd.read_csv(csv_path)
+    years = [col for col in df.columns if col.isdigit()]
+    values = df[years].to_numpy()
+    first_year = int(years[0])
+    new_years = [str(first_year + i) for i in range(n_years)]
+    values = values[:, np.arange(n_years) % len(years)] + rng.normal(0, 0.05, (len(df), n_years))
+
+    rows = []
+    for (base_category, category), row in zip(df[['Base Category', 'Categories']].itertuples(index=False), values):
+        if base_category in FEATURES:
+            rows.append((base_category, category, row))
+            for i in range(1, category_factor):
+                rows.append((base_category, f"{category} ({i})", row + rng.normal(0, 0.1, n_years)))
+        elif base_category == 'Quarter' and monthly:
+            quarter = int(category[1:])
+            for month in range(3 * quarter - 2, 3 * quarter + 1):
+                rows.append(('Quarter', f"M{month:02d}", row + rng.normal(0, 0.05, n_years)))
+        else:
+            rows.append((base_category, category, row))
+
+    out = pd.DataFrame([r[2] for r in rows], columns=new_years).round(2)
+    out.insert(0, 'Categories', [r[1] for r in rows])
+    out.insert(0, 'Base Category', [r[0] for r in rows])
+    out.to_csv(output_path, index=False)
+    return output_path
+
+
+def time_stage(fn, repeat=9):
+    """
+    Returns the median time per call in seconds over several timing runs.
+    """
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    return float(np.median(timer.repeat(repeat, number))) / number
+
+
+def dataset_stages(csv_path):
+    """
+    Returns the timed stages for one coefficient table, in pipeline order.
+    """
+    model = load_model(csv_path)
+    profile = {f: model['categories'][f][-1] for f in FEATURES}
+    probabilities = score_profile(model, profile)
+    results = build_results(model, probabilities)
+    year = model['years'][-1]
+    province = model['categories']['Province'][0]
+
+    def load_model_cold():
+        coefficient_store._models.clear()
+        load_model(csv_path)
+
+    return {
+        'compile_store': lambda: compile_coefficients(csv_path),
+        'load_model_cold': load_model_cold,
+        'load_model_warm': lambda: load_model(csv_path),
+        'load_coefficient_data': lambda: load_coefficient_data(csv_path),
+        'score_profile': lambda: score_profile(model, profile),
+        'build_results': lambda: build_results(model, probabilities),
+        'map_prep_all_years': lambda: province_map_frame(results, 'All', 'All'),
+        'map_prep_year': lambda: province_map_frame(results, year, 'All'),
+        'table_page': lambda: table_page(select_rows(results['table_index'], year, province),
+                                         'Year, highest probability first', 1, 50),
+        'trend_province': lambda: province_rows(results['trend'], province),
+    }
+
+
+def run_benchmarks(csv_path='Book2.csv', repeat=9, only=None):
+    """
+    Times every stage of every dataset, or only the 'dataset/stage' names
+    in only.
+    """
+    timings = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, spec in DATASETS.items():
+            path = os.path.join(tmp, os.path.basename(csv_path))
+            if spec is None:
+                shutil.copy(csv_path, path)
+            else:
+                path = synthetic_coefficients(csv_path, os.path.join(tmp, f"{name}.csv"), **spec)
+            for stage, fn in dataset_stages(path).items():
+                if only is None or f"{name}/{stage}" in only:
+                    timings[f"{name}/{stage}"] = time_stage(fn, repeat)
+        coefficient_store._models.clear()
+    return timings
+
+
+def compare(timings, baseline, threshold):
+    """
+    Prints every stage against its baseline and returns the stages that are
+    slower than the baseline by more than threshold (0.5 = 50%) and by more
+    than NOISE_FLOOR_SECONDS.
+    """
+    regressions = []
+    print(f"{'stage':<40}{'baseline':>12}{'current':>12}{'ratio':>8}")
+    for stage, seconds in timings.items():
+        base = baseline.get(stage)
+        if base is None:
+            print(f"{stage:<40}{'-':>12}{seconds * 1e3:>10.3f}ms{'new':>8}")
+            continue
+        ratio = seconds / base
+        flag = ''
+        if ratio > 1 + threshold and seconds - base > NOISE_FLOOR_SECONDS:
+            regressions.append(stage)
+            flag = '  REGRESSION'
+        print(f"{stage:<40}{base * 1e3:>10.3f}ms{seconds * 1e3:>10.3f}ms{ratio:>8.2f}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark loading, scoring and rendering prep.")
+    parser.add_argument('--coefficients', default='Book2.csv')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save', action='store_true', help="Write the timings as the new baseline")
+    parser.add_argument('--threshold', type=float, default=0.5,
+                        help="Allowed slowdown before a stage fails (0.5 = 50%%)")
+    parser.add_argument('--repeat', type=int, default=9)
+    args = parser.parse_args()
+
+    timings = run_benchmarks(args.coefficients, args.repeat)
+
+    if args.save or not os.path.exists(args.baseline):
+        with open(args.baseline, 'w') as f:
+            json.dump(timings, f, indent=2)
+        print(f"Saved {len(timings)} stage timings to {args.baseline}")
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(timings, baseline, args.threshold)
+    for _ in range(CONFIRM_RUNS):
+        if not regressions:
+            break
+        # Timings shift between processes and while the machine is busy;
+        # only a slowdown that persists in a fresh process counts.
+        print(f"Timing {len(regressions)} slower stage(s) again in a new process")
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as pool:
+            retimed = pool.submit(run_benchmarks, args.coefficients, args.repeat, regressions).result()
+        for stage, seconds in retimed.items():
+            timings[stage] = min(timings[stage], seconds)
+        regressions = compare({stage: timings[stage] for stage in regressions}, baseline, args.threshold)
+    if regressions:
+        print(f"{len(regressions)} stage(s) regressed: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+import argparse
+import gzip
+import hashlib
+import json
+import io
+import os
+import tarfile
+from urllib.request import urlopen
+
+import numpy as np
+
+# The bundle is built from the Canada map of the echarts-countries-pypkg
+# sdist (MIT); see canada_provinces.geojson.SOURCE.md.
+SOURCE_URL = ("https://files.pythonhosted.org/packages/7d/ad/096213437a6f93c66c256866489cbee3217fd9081fb4a1052d053e860daa/"
+              "echarts-countries-pypkg-0.1.6.tar.gz")
+SOURCE_SHA256 = "d1fb177bf887a5bdde229aad7e06c4002759fc9f7b51468d2486ef891f0468f3"
+SOURCE_MEMBER = "echarts_countries_pypkg/resources/echarts-countries-js/Canada.js"
+BUNDLED_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'canada_provinces.geojson.gz')
+
+def read_source(source):
+    """
+    Reads the provinces GeoJSON from a URL or local path: a GeoJSON file, an
+    ECharts map script (.js) or the echarts-countries-pypkg sdist (.tar.gz),
+    whose sha256 is checked against SOURCE_SHA256.
+    """
+    if source.startswith(('http://', 'https://')):
+        with urlopen(source) as response:
+            raw = response.read()
+    else:
+        with open(source, 'rb') as f:
+            raw = f.read()
+
+    if source.endswith('.tar.gz'):
+        digest = hashlib.sha256(raw).hexdigest()
+        if digest != SOURCE_SHA256:
+            raise ValueError(f"{source} has sha256 {digest}, expected {SOURCE_SHA256}")
+        with tarfile.open(fileobj=io.BytesIO(raw)) as tar:
+            member = next(m for m in tar.getmembers() if m.name.endswith('/' + SOURCE_MEMBER))
+            raw = tar.extractfile(member).read()
+        source = SOURCE_MEMBER
+    if source.endswith('.js'):
+        return decode_echarts_map(raw.decode('utf-8'))
+    return json.loads(raw)
+
+
+def decode_echarts_map(script):
+    """
+    Extracts the GeoJSON passed to echarts.registerMap in an ECharts map
+    script. Coordinates stored in ECharts' compressed form (UTF8Encoding:
+    zigzag-encoded deltas from each ring's encodeOffsets) are decoded.
+    """
+    start = script.index('{', script.index('registerMap('))
+    geojson, _ = json.JSONDecoder().raw_decode(script[start:])
+    if not geojson.pop('UTF8Encoding', False):
+        return geojson
+    scale = geojson.pop('UTF8Scale', None) or 1024
+
+    def decode_ring(encoded, offset):
+        x, y = offset
+        ring = []
+        for i in range(0, len(encoded), 2):
+            dx = ord(encoded[i]) - 64
+            dy = ord(encoded[i + 1]) - 64
+            x += (dx >> 1) ^ -(dx & 1)
+            y += (dy >> 1) ^ -(dy & 1)
+            ring.append([x / scale, y / scale])
+        return ring
+
+    for feature in geojson['features']:
+        geometry = feature['geometry']
+        offsets = geometry.pop('encodeOffsets')
+        if geometry['type'] == 'Polygon':
+            geometry['coordinates'] = [decode_ring(r, o) for r, o in zip(geometry['coordinates'], offsets)]
+        else:
+            geometry['coordinates'] = [[decode_ring(r, o) for r, o in zip(polygon, polygon_offsets)]
+                                       for polygon, polygon_offsets in zip(geometry['coordinates'], offsets)]
+    return geojson
+
+
+def simplify_line(points, tolerance):
+    """
+    Douglas-Peucker simplification of a list of [lon, lat] points. Points
+    closer than tolerance (in degrees) to the simplified line are dropped.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    if len(points) < 3:
+        return points
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end <= start + 1:
+            continue
+        a, b = points[start], points[end]
+        inner = points[start + 1:end]
+        dx, dy = b - a
+        length = np.hypot(dx, dy)
+        if length == 0:
+            # Closed rings start and end on the same point.
+            distance = np.hypot(inner[:, 0] - a[0], inner[:, 1] - a[1])
+        else:
+            distance = np.abs(dx * (inner[:, 1] - a[1]) - dy * (inner[:, 0] - a[0])) / length
+        i = int(np.argmax(distance))
+        if distance[i] > tolerance:
+            split = start + 1 + i
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+    return points[keep]
+
+
+def simplify_polygon(rings, tolerance, precision):
+    """
+    Simplifies the rings of one polygon. Returns None if the exterior ring
+    collapses below a triangle; collapsed holes are dropped.
+    """
+    simplified = []
+    for i, ring in enumerate(rings):
+        ring = np.round(simplify_line(ring, tolerance), precision)
+        if len(ring) < 4:
+            if i == 0:
+                return None
+            continue
+        simplified.append(ring.tolist())
+    return simplified
+
+
+def simplify_geojson(geojson, tolerance=0.02, precision=3):
+    """
+    Returns a copy of the provinces GeoJSON with simplified geometry, rounded
+    coordinates and only properties.name kept on each feature.
+    """
+    features = []
+    for feature in geojson['features']:
+        geometry = feature['geometry']
+        if geometry['type'] == 'Polygon':
+            polygons = [geometry['coordinates']]
+        else:
+            polygons = geometry['coordinates']
+
+        simplified = [simplify_polygon(p, tolerance, precision) for p in polygons]
+        simplified = [p for p in simplified if p is not None]
+        if not simplified:
+            # Keep the largest polygon so that small territories never vanish.
+            largest = max(polygons, key=lambda p: len(p[0]))
+            simplified = [[np.round(np.asarray(largest[0]), precision).tolist()]]
+
+        features.append({
+            'type': 'Feature',
+            'properties': {'name': feature['properties']['name']},
+            'geometry': {'type': 'MultiPolygon', 'coordinates': simplified},
+        })
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def build_bundle(source=SOURCE_URL, output=BUNDLED_PATH, tolerance=0.02, precision=3):
+    """
+    Downloads or reads the provinces GeoJSON, simplifies it and writes it as
+    compact gzipped JSON. Returns the uncompressed sizes before and after.
+    """
+    geojson = read_source(source)
+    simplified = simplify_geojson(geojson, tolerance, precision)
+    payload = json.dumps(simplified, separators=(',', ':')).encode()
+    # No file name or timestamp in the gzip header, so rebuilding from the
+    # same source writes the same bytes.
+    with open(output, 'wb') as raw, gzip.GzipFile(filename='', mode='wb', fileobj=raw, mtime=0) as f:
+        f.write(payload)
+    return len(json.dumps(geojson, separators=(',', ':'))), len(payload)
+
+
+def load_geojson(path=BUNDLED_PATH):
+    """
+    Loads the bundled provinces GeoJSON. The bundle is committed with the
+    app, so a missing file is an error rather than a reason to download.
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"{path} is missing; build it with `python canada_geojson.py`")
+    with gzip.open(path, 'rt') as f:
+        return json.load(f)
+
+
+def bundle_digest(path=BUNDLED_PATH):
+    """
+    Returns the sha256 of the bundle file, which identifies the geometry
+    without parsing it.
+    """
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vendor a simplified Canada provinces GeoJSON.")
+    parser.add_argument('--source', default=SOURCE_URL,
+                        help="URL or local path of a GeoJSON file, ECharts map script or the pinned sdist")
+    parser.add_argument('--output', default=BUNDLED_PATH)
+    parser.add_argument('--tolerance', type=float, default=0.02,
+                        help="Simplification tolerance in degrees")
+    parser.add_argument('--precision', type=int, default=3,
+                        help="Decimal places kept in coordinates")
+    args = parser.parse_args()
+
+    before, after = build_bundle(args.source, args.output, args.tolerance, args.precision)
+    print(f"Wrote {args.output}: {before / 1e6:.2f} MB -> {after / 1e6:.2f} MB of GeoJSON "
+          f"({os.path.getsize(args.output) / 1e6:.2f} MB gzipped)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+import hashlib
+import os
+import tempfile
+import threading
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+STORE_SUFFIX = '.coefficients.npz'
+
+_models = {}
+_lock = threading.Lock()
+
+# mkstemp creates owner-only files; stores get the mode of any new file instead
+_umask = os.umask(0)
+os.umask(_umask)
+
+
+def file_sha256(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def store_path_for(csv_path):
+    return os.path.splitext(csv_path)[0] + STORE_SUFFIX
+
+
+def compile_coefficients(csv_path, store_path=None):
+    """
+    Parses the coefficient CSV once and writes a compiled store next to it.
+    The store holds integer feature codes for every coefficient row, the
+    category and year string tables and the coefficient matrix (rows x years),
+    together with the mtime, size and hash of the CSV it was built from.
+    """
+    store_path = store_path or store_path_for(csv_path)
+    _write_store(csv_path, store_path)
+    return store_path
+
+
+def _write_store(csv_path, store_path):
+    """
+    Compiles and writes the store, returning its arrays as they were written.
+    """
+    df = pd.read_csv(csv_path)
+    years = [col for col in df.columns if col.isdigit()]
+
+    is_intercept = (df['Base Category'] == 'Intercept').to_numpy()
+    rows = df[~is_intercept]
+    feature_codes, features = pd.factorize(rows['Base Category'])
+    stat = os.stat(csv_path)
+    store = {
+        'years': np.array(years, dtype=str),
+        'features': np.array(features, dtype=str),
+        'feature_codes': feature_codes.astype(np.int16),
+        'categories': rows['Categories'].to_numpy(dtype=str),
+        'coefficients': rows[years].to_numpy(dtype=np.float64),
+        'intercept': df.loc[is_intercept, years].iloc[0].to_numpy(dtype=np.float64),
+        'source_mtime_ns': np.int64(stat.st_mtime_ns),
+        'source_size': np.int64(stat.st_size),
+        'source_sha256': np.array(file_sha256(csv_path)),
+    }
+
+    # Every writer gets its own temporary file next to the store, so processes
+    # compiling at the same time never rename each other's partial output.
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(store_path)),
+                                    suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, **store)
+        os.chmod(tmp_path, 0o666 & ~_umask)
+        os.replace(tmp_path, store_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return store
+
+
+def _read_store(store_path):
+    """
+    Returns the arrays of a store, or None if it is missing or unreadable
+    (for example truncated), so that it gets compiled again.
+    """
+    try:
+        with np.load(store_path, allow_pickle=False) as data:
+            return {key: data[key] for key in data.files}
+    except (OSError, EOFError, ValueError, zipfile.BadZipFile):
+        return None
+
+
+def _is_current(store, csv_path):
+    stat = os.stat(csv_path)
+    if (int(store['source_mtime_ns']) == stat.st_mtime_ns
+            and int(store['source_size']) == stat.st_size):
+        return True
+    # The file was touched; only its contents decide whether to recompile.
+    return str(store['source_sha256']) == file_sha256(csv_path)
+
+
+def _model_from_store(store):
+    years = store['years'].tolist()
+    categories = {}
+    coefficients = {}
+    for code, feature in enumerate(store['features'].tolist()):
+        rows = store['feature_codes'] == code
+        categories[feature] = store['categories'][rows].tolist()
+        coefficients[feature] = np.ascontiguousarray(store['coefficients'][rows].T)
+        coefficients[feature].setflags(write=False)
+    intercept = store['intercept']
+    intercept.setflags(write=False)
+
+    return {
+        'years': years,
+        'intercept': intercept,
+        'categories': categories,
+        'index': {
+            feature: {category: i for i, category in enumerate(labels)}
+            for feature, labels in categories.items()
+        },
+        'coefficients': coefficients,
+        'source_sha256': str(store['source_sha256']),
+    }
+
+
+def load_model(csv_path, store_path=None):
+    """
+    Returns the dense coefficient model for the CSV, compiling the store first
+    if it is missing or the CSV has changed since it was built.
+    The model is loaded once per process and shared by every caller, so its
+    arrays are read-only. A changed CSV is picked up on the next call.
+    """
+    store_path = store_path or store_path_for(csv_path)
+    stat = os.stat(csv_path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+
+    cached = _models.get(store_path)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+
+    with _lock:
+        cached = _models.get(store_path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+        store = _read_store(store_path)
+        if store is None or not _is_current(store, csv_path):
+            # Build the model from the arrays just written rather than reading
+            # the file back, which another process may be replacing.
+            store = _write_store(csv_path, store_path)
+
+        model = _model_from_store(store)
+        _models[store_path] = (signature, model)
+        return model
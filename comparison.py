@@ -0,0 +1,137 @@
+import numpy as np
+import pandas as pd
+
+from scoring import FEATURES, encode_column, score_profiles
+from trends import period_labels
+
+MAX_PROFILES = 50
+
+
+def unique_names(names):
+    """
+    Makes profile names unique by numbering repeats: 'A', 'A (2)', ...
+    """
+    seen = {}
+    unique = []
+    for name in names:
+        seen[name] = seen.get(name, 0) + 1
+        unique.append(name if seen[name] == 1 else f"{name} ({seen[name]})")
+    return unique
+
+
+def read_profiles(csv_file, model, max_profiles=MAX_PROFILES):
+    """
+    Reads profiles to compare from a CSV with one column per profile
+    attribute and an optional Profile column naming each row. Raises
+    ValueError for missing columns, unknown values or too many rows.
+    Returns a list of (name, profile) pairs.
+    """
+    df = pd.read_csv(csv_file, dtype=str)
+    missing = [feature for feature in FEATURES if feature not in df.columns]
+    if missing:
+        raise ValueError(f"Profiles file is missing columns: {', '.join(missing)}")
+    if len(df) > max_profiles:
+        raise ValueError(f"At most {max_profiles} profiles can be compared, the file has {len(df)}")
+    for feature in FEATURES:
+        encode_column(model, feature, df[feature])
+
+    if 'Profile' in df.columns:
+        names = df['Profile'].fillna('').astype(str).tolist()
+    else:
+        names = [f"Profile {i + 1}" for i in range(len(df))]
+    profiles = df[FEATURES].to_dict('records')
+    return list(zip(unique_names(names), profiles))
+
+
+def compare_profiles(model, named_profiles):
+    """
+    Scores every profile in one call and returns the comparison results:
+    the profile names and attributes, the (profiles, years, provinces,
+    quarters) probability tensor and the same values as one long table
+    keyed by Profile, with categorical columns.
+    """
+    names = unique_names([name for name, _ in named_profiles])
+    profiles = [profile for _, profile in named_profiles]
+    probabilities = score_profiles(model, profiles)
+    probabilities.setflags(write=False)
+
+    years = model['years']
+    provinces = model['categories']['Province']
+    quarters = model['categories']['Quarter']
+    n_profiles, n_years, n_provinces, n_quarters = probabilities.shape
+    grid = np.indices(probabilities.shape).reshape(4, -1)
+    table = pd.DataFrame({
+        'Profile': pd.Categorical.from_codes(grid[0], categories=names),
+        'Year': pd.Categorical.from_codes(grid[1], categories=years),
+        'Province': pd.Categorical.from_codes(grid[2], categories=provinces),
+        'Quarter': pd.Categorical.from_codes(grid[3], categories=quarters),
+        'Probability': probabilities.reshape(-1),
+    })
+
+    attributes = pd.DataFrame(profiles, columns=FEATURES)
+    attributes.insert(0, 'Profile', names)
+    return {
+        'names': names,
+        'profiles': attributes,
+        'probabilities': probabilities,
+        'table': table,
+        'years': years,
+        'provinces': provinces,
+        'quarters': quarters,
+    }
+
+
+def _select(comparison, year, province):
+    probabilities = comparison['probabilities']
+    if year != 'All':
+        y = comparison['years'].index(year)
+        probabilities = probabilities[:, y:y + 1]
+    if province != 'All':
+        p = comparison['provinces'].index(province)
+        probabilities = probabilities[:, :, p:p + 1]
+    return probabilities
+
+
+def comparison_summary(comparison, year='All', province='All'):
+    """
+    Returns one row per profile with its attributes and its mean, minimum
+    and maximum probability over the selected year and province.
+    """
+    probabilities = _select(comparison, year, province)
+    flat = probabilities.reshape(len(comparison['names']), -1)
+    summary = comparison['profiles'].copy()
+    summary['Mean Probability'] = np.round(flat.mean(axis=1), 2)
+    summary['Min'] = flat.min(axis=1)
+    summary['Max'] = flat.max(axis=1)
+    return summary
+
+
+def comparison_trend(comparison, province='All', profiles=None):
+    """
+    Returns the trend of each profile (or only the named ones) by year and
+    quarter, for one province or averaged over all of them, as a long
+    DataFrame with an ordered Period column for the x axis.
+    """
+    year_order = np.argsort(comparison['years'], kind='stable')
+    means = _select(comparison, 'All', province).mean(axis=2)[:, year_order]
+    names = comparison['names']
+    keep = [i for i, name in enumerate(names) if profiles is None or name in profiles]
+    n_years, n_quarters = means.shape[1:]
+    labels = period_labels(comparison['years'], comparison['quarters'])
+    return pd.DataFrame({
+        'Profile': np.repeat(np.asarray(names, dtype=object)[keep], n_years * n_quarters),
+        'Period': pd.Categorical(labels * len(keep), categories=labels, ordered=True),
+        'Year': np.tile(np.repeat(np.asarray(comparison['years'])[year_order], n_quarters), len(keep)),
+        'Quarter': np.tile(comparison['quarters'], n_years * len(keep)),
+        'Probability': np.round(means[keep].reshape(-1), 2),
+    })
+
+
+def comparison_map(comparison, profile, year='All'):
+    """
+    Returns the mean probability per province of one profile for a year (or
+    all years) as a Series indexed by province.
+    """
+    i = comparison['names'].index(profile)
+    means = _select(comparison, year, 'All')[i].mean(axis=(0, 2))
+    return pd.Series(means, index=comparison['provinces'])
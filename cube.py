@@ -0,0 +1,104 @@
+import argparse
+import json
+import os
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from coefficient_store import load_model
+from scoring import FEATURES, logistic_percent
+
+DEFAULT_CUBE_PATH = 'probability_cube'
+
+
+def build_cube(csv_path, cube_path=DEFAULT_CUBE_PATH):
+    """
+    Precomputes the probability of every profile for every year, province and
+    quarter and writes it to <cube_path>.npy as uint16 basis points, with the
+    category labels in <cube_path>.json.
+    The array is laid out profile-major (Age, Gender, MarStat, Educ, Inmig, NOC,
+    Year, Province, Quarter) so that each profile is one contiguous block.
+    """
+    model = load_model(csv_path)
+    features = FEATURES + ['Province', 'Quarter']
+    shape = tuple(len(model['categories'][f]) for f in FEATURES)
+    shape += (len(model['years']),)
+    shape += tuple(len(model['categories'][f]) for f in ['Province', 'Quarter'])
+
+    cube = open_memmap(cube_path + '.npy', mode='w+', dtype=np.uint16, shape=shape)
+    n_features = len(features)
+    for y in range(len(model['years'])):
+        # Terms are added in the same order as score_profile so the cube holds
+        # exactly the probabilities the apps would compute on the fly.
+        logit = model['intercept'][y]
+        for axis, feature in enumerate(features):
+            values = model['coefficients'][feature][y]
+            logit = logit + values.reshape([-1 if i == axis else 1 for i in range(n_features)])
+        basis_points = np.rint(logistic_percent(logit) * 100).astype(np.uint16)
+        cube[..., y, :, :] = basis_points
+    cube.flush()
+    del cube
+
+    metadata = {
+        'source': os.path.basename(csv_path),
+        'source_sha256': model['source_sha256'],
+        'features': FEATURES,
+        'years': model['years'],
+        'categories': {f: model['categories'][f] for f in features},
+    }
+    with open(cube_path + '.json', 'w') as f:
+        json.dump(metadata, f, indent=2)
+    return shape
+
+
+def load_cube(cube_path=DEFAULT_CUBE_PATH):
+    """
+    Memory-maps a cube written by build_cube. Pages are read lazily and shared
+    through the OS page cache by every process that maps the same file.
+    """
+    with open(cube_path + '.json') as f:
+        metadata = json.load(f)
+    metadata['probabilities'] = np.load(cube_path + '.npy', mmap_mode='r')
+    metadata['index'] = {
+        feature: {category: i for i, category in enumerate(labels)}
+        for feature, labels in metadata['categories'].items()
+    }
+    return metadata
+
+
+def load_cube_for(source_sha256, cube_path=DEFAULT_CUBE_PATH):
+    """
+    Returns the cube built from the CSV with the given hash, or None if it has
+    not been built or was built from another version of the CSV.
+    """
+    if not os.path.exists(cube_path + '.npy') or not os.path.exists(cube_path + '.json'):
+        return None
+    cube = load_cube(cube_path)
+    if cube['source_sha256'] != source_sha256:
+        return None
+    return cube
+
+
+def lookup_profile(cube, selected_profile):
+    """
+    Returns the (years, provinces, quarters) probabilities of a profile in
+    percent, read straight from the cube without any scoring.
+    """
+    key = tuple(cube['index'][f][selected_profile[f]] for f in cube['features'])
+    return cube['probabilities'][key] / 100
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the precomputed probability cube.")
+    parser.add_argument('csv_path', nargs='?', default='Book2.csv')
+    parser.add_argument('--output', default=DEFAULT_CUBE_PATH,
+                        help="Output path without extension (.npy and .json are written)")
+    args = parser.parse_args()
+
+    shape = build_cube(args.csv_path, args.output)
+    print(f"Wrote {args.output}.npy with shape {shape} "
+          f"({np.prod(shape) * 2 / 1e6:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
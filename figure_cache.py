@@ -0,0 +1,134 @@
+import hashlib
+import io
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_MAX_BYTES = int(os.environ.get('FIGURE_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+
+_entries = OrderedDict()
+_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'bytes': 0, 'max_bytes': DEFAULT_MAX_BYTES}
+
+
+def figure_key(name, *parts):
+    """
+    Returns the cache key of a figure: its name and a sha256 of the inputs
+    it is drawn from. DataFrames, Series and arrays are hashed by content,
+    anything else by its repr.
+    """
+    digest = hashlib.sha256(name.encode())
+    for part in parts:
+        if isinstance(part, (pd.DataFrame, pd.Series)):
+            digest.update(pd.util.hash_pandas_object(part, index=True).to_numpy().tobytes())
+            if isinstance(part, pd.DataFrame):
+                digest.update(repr(list(part.columns)).encode())
+        elif isinstance(part, np.ndarray):
+            digest.update(repr((part.dtype.str, part.shape)).encode())
+            digest.update(np.ascontiguousarray(part).tobytes())
+        else:
+            digest.update(repr(part).encode())
+        digest.update(b'\0')
+    return (name, digest.hexdigest())
+
+
+def png_bytes(fig, dpi=100):
+    """
+    Renders a matplotlib figure to PNG bytes and closes it, so figures never
+    accumulate in pyplot's figure manager.
+    """
+    import matplotlib.pyplot as plt
+
+    try:
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format='png', dpi=dpi, bbox_inches='tight')
+        return buffer.getvalue()
+    finally:
+        plt.close(fig)
+
+
+def object_size(obj):
+    """
+    Returns the approximate memory held by nested dicts, lists and tuples of
+    plain values and arrays, such as a GeoJSON mapping or a Plotly figure's
+    data. Used to charge figure objects against the cache budget.
+    """
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(object_size(k) + object_size(v) for k, v in obj.items())
+    if isinstance(obj, (list, tuple)):
+        return sys.getsizeof(obj) + sum(object_size(v) for v in obj)
+    if isinstance(obj, np.ndarray):
+        return sys.getsizeof(obj) + obj.nbytes
+    return sys.getsizeof(obj)
+
+
+def _evict():
+    while _stats['bytes'] > _stats['max_bytes'] and _entries:
+        _, (_, size) = _entries.popitem(last=False)
+        _stats['bytes'] -= size
+        _stats['evictions'] += 1
+
+
+def set_max_bytes(max_bytes):
+    with _lock:
+        _stats['max_bytes'] = max_bytes
+        _evict()
+
+
+def lookup(key):
+    """
+    Returns the figure cached under key, or None on a miss. Figure objects
+    are shared by every caller and must not be modified.
+    """
+    with _lock:
+        entry = _entries.get(key)
+        if entry is None:
+            _stats['misses'] += 1
+            return None
+        _entries.move_to_end(key)
+        _stats['hits'] += 1
+        return entry[0]
+
+
+def store(key, figure, size=None):
+    """
+    Caches a figure under key and returns it. PNG bytes and text are charged
+    by their length; figure objects, such as a built Plotly figure, need
+    their size in bytes (see object_size). Least recently used figures are
+    evicted once the cache holds more than max_bytes; a figure larger than
+    max_bytes is returned but not kept.
+    """
+    if size is None:
+        size = len(figure)
+    with _lock:
+        if key not in _entries:
+            _entries[key] = (figure, size)
+            _stats['bytes'] += size
+            _evict()
+    return figure
+
+
+def get_or_render(key, render):
+    """
+    Returns the serialized figure for key, calling render() on a miss.
+    render must return PNG bytes or text, e.g. from png_bytes.
+    """
+    figure = lookup(key)
+    if figure is None:
+        figure = store(key, render())
+    return figure
+
+
+def cache_stats():
+    with _lock:
+        return dict(_stats, entries=len(_entries))
+
+
+def clear():
+    with _lock:
+        _entries.clear()
+        _stats['bytes'] = 0
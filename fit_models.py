@@ -0,0 +1,280 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from coefficient_store import compile_coefficients
+from imputation import METHODS, impute_by_group
+from lfs_ingest import DEFAULT_OUTPUT, available_years, load_labels, load_year
+
+# Coefficient table feature -> LFS variable, in the row order of Book2.csv
+MODEL_VARIABLES = {
+    'Province': 'PROV',
+    'Age': 'AGE_12',
+    'Gender': 'SEX',
+    'MarStat': 'MARSTAT',
+    'Educ': 'EDUC',
+    'Inmig': 'IMMIG',
+    'NOC': 'NOC_10',
+    'Quarter': 'Quarter',
+}
+
+# Reference categories of the regressions in 04 Regresiones.ipynb
+REFERENCES = {
+    'Province': 'Newfoundland and Labrador',
+    'Age': '15 to 19 years',
+    'Gender': 'Female',
+    'MarStat': 'Separated',
+    'Educ': '0 to 8 years',
+    'Inmig': 'Non-immigrant',
+    'NOC': 'Occupations in art, culture, recreation and sport, except management',
+    'Quarter': 'Q1',
+}
+
+EMPLOYED = {'Employed, absent from work', 'Employed, at work'}
+
+MONTH_QUARTERS = {
+    'January': 'Q1', 'February': 'Q1', 'March': 'Q1',
+    'April': 'Q2', 'May': 'Q2', 'June': 'Q2',
+    'July': 'Q3', 'August': 'Q3', 'September': 'Q3',
+    'October': 'Q4', 'November': 'Q4', 'December': 'Q4',
+}
+
+DEFAULT_REPORT = 'fit_report.json'
+
+
+def year_cells(root, year, impute='sample', seed=0):
+    """
+    Compresses one year of LFS microdata to its sufficient statistics: one
+    row per distinct combination of the labelled model features, with the
+    number of respondents (n_total) and of employed respondents
+    (n_employed) in it. Grouping runs on the integer codes, so the
+    row-level data is never expanded to labels. Missing NOC_10 codes are
+    imputed within each (SEX, MARSTAT, EDUC) group first.
+    """
+    df = impute_by_group(load_year(root, year), 'NOC_10', method=impute, seed=seed)
+    labels = load_labels(root, year)
+
+    employed = [code for code, label in labels['LFSSTAT'].items() if label in EMPLOYED]
+    quarters = {code: MONTH_QUARTERS.get(label) for code, label in labels['SURVMNTH'].items()}
+    variables = [variable for variable in MODEL_VARIABLES.values() if variable != 'Quarter']
+    codes = df[variables].assign(
+        Quarter=df['SURVMNTH'].map(quarters),
+        Has_a_job=df['LFSSTAT'].isin(employed).astype(np.int32),
+    )
+    cells = (codes.groupby(variables + ['Quarter'], sort=False, dropna=True)['Has_a_job']
+             .agg(n_employed='sum', n_total='size')
+             .reset_index())
+
+    frame = pd.DataFrame({
+        feature: cells[variable] if variable == 'Quarter' else cells[variable].map(labels[variable])
+        for feature, variable in MODEL_VARIABLES.items()
+    })
+    frame['n_employed'] = cells['n_employed'].to_numpy()
+    frame['n_total'] = cells['n_total'].to_numpy()
+    return frame.dropna()
+
+
+def feature_levels(frame):
+    """
+    Returns {feature: [reference, other categories sorted]} for the
+    categories present in a frame of cells, the treatment coding order of
+    the statsmodels formulas and of Book2.csv.
+    """
+    levels = {}
+    for feature in MODEL_VARIABLES:
+        observed = sorted(set(frame[feature].unique()) - {REFERENCES[feature]})
+        levels[feature] = [REFERENCES[feature]] + observed
+    return levels
+
+
+def design_matrix(frame, levels):
+    """
+    Returns the treatment-coded design matrix of a frame of cells and the
+    (feature, category) name of each column after the intercept.
+    """
+    names = [(feature, category) for feature, categories in levels.items() for category in categories[1:]]
+    X = np.zeros((len(frame), len(names) + 1))
+    X[:, 0] = 1.0
+    column = 1
+    for feature, categories in levels.items():
+        codes = pd.Categorical(frame[feature], categories=categories).codes
+        rows = np.flatnonzero(codes > 0)
+        X[rows, column + codes[rows] - 1] = 1.0
+        column += len(categories) - 1
+    return X, names
+
+
+def fit_year(root, year, start=None, impute='sample', seed=0):
+    """
+    Fits the employment logit for one year as a binomial model on the
+    year's cell counts, which has the same likelihood, coefficients and
+    log-likelihood as the row-level logit. A fit of another year given as
+    start seeds the optimizer; coefficients it does not have start at zero.
+    """
+    import statsmodels.api as sm
+
+    started = time.perf_counter()
+    cells = year_cells(root, year, impute, seed)
+    levels = feature_levels(cells)
+    X, names = design_matrix(cells, levels)
+    start_params = None
+    if start is not None:
+        start_params = np.array([start['intercept']]
+                                + [start['coefficients'].get(name, 0.0) for name in names])
+
+    # Each cell enters twice, employed and not employed, weighted by its counts.
+    n_employed = cells['n_employed'].to_numpy()
+    weights = np.concatenate([n_employed, cells['n_total'].to_numpy() - n_employed])
+    y = np.repeat([1.0, 0.0], len(cells))
+    keep = weights > 0
+    model = sm.GLM(y[keep], np.vstack([X, X])[keep], family=sm.families.Binomial(),
+                   freq_weights=weights[keep])
+    result = model.fit(start_params=start_params)
+    return {
+        'year': year,
+        'intercept': float(result.params[0]),
+        'coefficients': dict(zip(names, result.params[1:].tolist())),
+        'levels': levels,
+        'seconds': time.perf_counter() - started,
+        'converged': bool(result.converged),
+        'iterations': int(result.fit_history['iteration']),
+        'warm_start': start is not None,
+        'log_likelihood': float(result.llf),
+        'nobs': int(weights.sum()),
+        'cells': len(cells),
+    }
+
+
+def read_fits(csv_path):
+    """
+    Returns the coefficients of an existing table as {year: fit}, or {} if
+    there is none yet. These fits carry no timing or convergence details.
+    """
+    if not os.path.exists(csv_path):
+        return {}
+    df = pd.read_csv(csv_path)
+    levels = {}
+    for feature, category in zip(df['Base Category'], df['Categories']):
+        if feature != 'Intercept':
+            levels.setdefault(feature, []).append(category)
+
+    fits = {}
+    for year in [col for col in df.columns if col.isdigit()]:
+        values = dict(zip(zip(df['Base Category'], df['Categories']), df[year]))
+        fits[int(year)] = {
+            'year': int(year),
+            'intercept': values.pop(('Intercept', 'Intercept')),
+            'coefficients': values,
+            'levels': levels,
+        }
+    return fits
+
+
+def fit_years(root, years, previous=None, workers=None, impute='sample', seed=0):
+    """
+    Fits every year in its own worker process. A year is warm-started from
+    the previous year's coefficients in previous ({year: fit}) if there are
+    any, else from its own earlier coefficients. Returns {year: fit}.
+    """
+    previous = previous or {}
+    fits = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(fit_year, root, year, previous.get(year - 1, previous.get(year)), impute, seed)
+            for year in years
+        ]
+        for future in as_completed(futures):
+            fit = future.result()
+            fits[fit['year']] = fit
+    return dict(sorted(fits.items()))
+
+
+def coefficient_table(fits):
+    """
+    Lays out the fits like Book2.csv: an intercept row, then each feature's
+    reference category (0) followed by its other categories, one column per
+    year. A category missing from some year's data gets 0 there, the same
+    as its reference.
+    """
+    levels = {}
+    for fit in fits.values():
+        for feature, categories in fit['levels'].items():
+            known = levels.setdefault(feature, [categories[0]])
+            known.extend(c for c in categories[1:] if c not in known)
+    for feature in levels:
+        levels[feature] = [levels[feature][0]] + sorted(levels[feature][1:])
+
+    rows = [('Intercept', 'Intercept')] + [
+        (feature, category) for feature, categories in levels.items() for category in categories
+    ]
+    table = pd.DataFrame(rows, columns=['Base Category', 'Categories'])
+    for year, fit in fits.items():
+        table[str(year)] = [
+            fit['intercept'] if feature == 'Intercept' else fit['coefficients'].get((feature, category), 0.0)
+            for feature, category in rows
+        ]
+    return table
+
+
+def write_coefficients(fits, csv_path='Book2.csv', decimals=2, report_path=DEFAULT_REPORT):
+    """
+    Writes the coefficient table and compiles its store, then records the
+    fit time and convergence of the fitted years in a JSON report (entries
+    for other years are kept).
+    """
+    table = coefficient_table(fits)
+    years = [col for col in table.columns if col.isdigit()]
+    table[years] = table[years].round(decimals)
+    table.to_csv(csv_path, index=False, encoding='utf-8-sig')
+    compile_coefficients(csv_path)
+
+    report = {}
+    if os.path.exists(report_path):
+        with open(report_path) as f:
+            report = json.load(f)
+    for year, fit in fits.items():
+        if 'seconds' in fit:
+            report[str(year)] = {key: fit[key] for key in
+                                 ('seconds', 'converged', 'iterations', 'warm_start', 'log_likelihood',
+                                  'nobs', 'cells')}
+    with open(report_path, 'w') as f:
+        json.dump(dict(sorted(report.items())), f, indent=2)
+    return table
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit the yearly employment logits and write Book2.csv.")
+    parser.add_argument('--data', default=DEFAULT_OUTPUT, help="Year-partitioned Parquet from lfs_ingest.py")
+    parser.add_argument('--years', type=int, nargs='*', help="Years to (re)fit; default all")
+    parser.add_argument('--output', default='Book2.csv')
+    parser.add_argument('--report', default=DEFAULT_REPORT)
+    parser.add_argument('--decimals', type=int, default=2)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--impute', choices=METHODS, default='sample',
+                        help="Fill missing NOC_10 by sampling from, or with the mode of, its (SEX, MARSTAT, EDUC) group")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    years = args.years or available_years(args.data)
+    previous = read_fits(args.output)
+    start = time.perf_counter()
+    fits = fit_years(args.data, years, previous, args.workers, args.impute, args.seed)
+    for year, fit in fits.items():
+        status = 'converged' if fit['converged'] else 'NOT CONVERGED'
+        print(f"{year}: {fit['nobs']} rows in {fit['cells']} cells, {fit['iterations']} iterations, {status}, {fit['seconds']:.1f}s")
+
+    # Years that were not refitted keep their existing coefficients.
+    write_coefficients({**previous, **fits}, args.output, args.decimals, args.report)
+    print(f"Wrote {args.output} and {args.report} in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    if not all(fit['converged'] for fit in fits.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
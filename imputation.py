@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+
+from lfs_ingest import small_int_codes
+
+GROUP_COLUMNS = ['SEX', 'MARSTAT', 'EDUC']
+METHODS = ('sample', 'mode')
+
+
+def group_ids(df, columns):
+    """
+    Returns one integer id per row for its combination of the (integer
+    coded) group columns, and the number of possible ids.
+    """
+    ids = np.zeros(len(df), dtype=np.int64)
+    n_groups = 1
+    for col in columns:
+        codes, uniques = pd.factorize(df[col], use_na_sentinel=False)
+        ids = ids * len(uniques) + codes
+        n_groups *= len(uniques)
+    return ids, n_groups
+
+
+def group_distribution(df, target, by=GROUP_COLUMNS):
+    """
+    Counts the observed target codes per group. Returns the group id of
+    every row, the target categories and a (groups x categories) count
+    matrix. Groups with no observed target take the distribution over all
+    groups, so every row has something to impute from.
+    """
+    ids, n_groups = group_ids(df, by)
+    values = df[target]
+    observed = values.notna().to_numpy()
+    categories, codes = np.unique(values[observed].to_numpy(dtype=np.int64), return_inverse=True)
+
+    counts = np.bincount(ids[observed] * len(categories) + codes,
+                         minlength=n_groups * len(categories)).reshape(n_groups, len(categories))
+    empty = counts.sum(axis=1) == 0
+    counts[empty] = counts.sum(axis=0)
+    return ids, categories, counts
+
+
+def impute_by_group(df, target, by=GROUP_COLUMNS, method='sample', seed=0):
+    """
+    Fills missing target codes from the distribution of the target within
+    each group of the by columns: with the most frequent code of the group
+    (method='mode', ties to the lowest code) or with a draw from the group's
+    distribution (method='sample', reproducible for a given seed and row
+    order). Returns a copy of df.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown imputation method: {method}")
+    df = df.copy()
+    missing = df[target].isna().to_numpy()
+    if not missing.any():
+        return df
+    if missing.all():
+        raise ValueError(f"{target} has no observed values to impute from")
+
+    ids, categories, counts = group_distribution(df, target, by)
+    rows = ids[missing]
+    if method == 'mode':
+        filled = categories[np.argmax(counts, axis=1)][rows]
+    else:
+        cumulative = np.cumsum(counts, axis=1)
+        cumulative = cumulative / cumulative[:, -1:]
+        draws = np.random.default_rng(seed).random(len(rows))
+        picks = (draws[:, None] >= cumulative[rows]).sum(axis=1)
+        filled = categories[np.minimum(picks, len(categories) - 1)]
+
+    column = df[target].to_numpy(dtype=np.float64, na_value=np.nan)
+    column[missing] = filled
+    df[target] = small_int_codes(column)
+    return df
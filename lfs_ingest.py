@@ -0,0 +1,168 @@
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+# Only these LFS variables are used by the models; everything else in the
+# SPSS files is never read.
+LFS_COLUMNS = ['LFSSTAT', 'PROV', 'AGE_12', 'SEX', 'MARSTAT', 'EDUC', 'IMMIG', 'NOC_10', 'SURVMNTH']
+
+DEFAULT_OUTPUT = 'lfs_parquet'
+LABELS_KEY = b'lfs_value_labels'
+
+# Both file namings used by the notebooks: LFS_April_2023.sav and 2023.sav
+SOURCE_PATTERN = re.compile(r'^(?:LFS_April_)?(\d{4})\.sav$', re.IGNORECASE)
+
+
+def find_sources(directory, years=None):
+    """
+    Returns {year: path} for the LFS SPSS files in a directory, optionally
+    restricted to some years.
+    """
+    sources = {}
+    for path in sorted(glob.glob(os.path.join(directory, '*.sav'))):
+        match = SOURCE_PATTERN.match(os.path.basename(path))
+        if match:
+            year = int(match.group(1))
+            if years is None or year in years:
+                sources.setdefault(year, path)
+    return sources
+
+
+def partition_path(root, year):
+    return os.path.join(root, f"year={year}", 'part-0.parquet')
+
+
+def small_int_codes(values):
+    """
+    Converts SPSS numeric codes (floats, NaN for missing) to the smallest
+    integer dtype that holds them, nullable only when values are missing.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    missing = np.isnan(values)
+    present = values[~missing]
+    high = present.max() if len(present) else 0
+    low = present.min() if len(present) else 0
+    dtype = np.int8 if -128 <= low and high <= 127 else np.int16
+    codes = np.where(missing, 0, values).astype(dtype)
+    if missing.any():
+        return pd.arrays.IntegerArray(codes, missing)
+    return codes
+
+
+def read_year(path, columns=LFS_COLUMNS):
+    """
+    Reads only the given columns of one LFS SPSS file as integer codes.
+    Returns the DataFrame and the value labels {column: {code: label}}.
+    """
+    import pyreadstat
+
+    df, meta = pyreadstat.read_sav(path, usecols=columns, apply_value_formats=False)
+    codes = pd.DataFrame({col: small_int_codes(df[col].to_numpy()) for col in columns})
+    labels = {
+        col: {int(code): label for code, label in meta.variable_value_labels.get(col, {}).items()}
+        for col in columns
+    }
+    return codes, labels
+
+
+def write_year(df, labels, output_path):
+    """
+    Writes one year's codes as Parquet with the value labels kept in the
+    schema metadata. The file is written under a temporary name and moved
+    into place so readers never see a partial partition.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[LABELS_KEY] = json.dumps(labels).encode()
+    table = table.replace_schema_metadata(metadata)
+
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    tmp_path = output_path + '.tmp'
+    pq.write_table(table, tmp_path, compression='zstd')
+    os.replace(tmp_path, output_path)
+
+
+def ingest_year(year, path, root):
+    """
+    Reads and writes one year's partition. Runs in a worker process and
+    returns (year, rows, seconds).
+    """
+    start = time.perf_counter()
+    df, labels = read_year(path)
+    write_year(df, labels, partition_path(root, year))
+    return year, len(df), time.perf_counter() - start
+
+
+def ingest(sources, root=DEFAULT_OUTPUT, workers=None):
+    """
+    Converts every {year: path} SPSS file into root/year=YYYY/part-0.parquet,
+    one year per worker process. Returns {year: (rows, seconds)}.
+    """
+    done = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(ingest_year, year, path, root) for year, path in sources.items()]
+        for future in as_completed(futures):
+            year, rows, seconds = future.result()
+            done[year] = (rows, seconds)
+    return dict(sorted(done.items()))
+
+
+def available_years(root=DEFAULT_OUTPUT):
+    years = [int(name[len('year='):]) for name in os.listdir(root) if name.startswith('year=')]
+    return sorted(year for year in years if os.path.exists(partition_path(root, year)))
+
+
+def load_labels(root, year):
+    import pyarrow.parquet as pq
+
+    metadata = pq.read_schema(partition_path(root, year)).metadata
+    labels = json.loads(metadata[LABELS_KEY])
+    return {col: {int(code): label for code, label in values.items()} for col, values in labels.items()}
+
+
+def load_year(root, year, columns=None, labeled=False):
+    """
+    Loads one year's partition. Columns hold integer codes unless labeled
+    is set, in which case they are categoricals of the SPSS value labels.
+    """
+    df = pd.read_parquet(partition_path(root, year), columns=columns)
+    if labeled:
+        labels = load_labels(root, year)
+        for col in df.columns:
+            if labels.get(col):
+                df[col] = pd.Categorical(df[col].map(labels[col]),
+                                         categories=list(dict.fromkeys(labels[col].values())))
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert LFS SPSS files into year-partitioned Parquet.")
+    parser.add_argument('source_dir', help="Directory with LFS_April_{year}.sav or {year}.sav files")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT)
+    parser.add_argument('--years', type=int, nargs='*')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    sources = find_sources(args.source_dir, args.years)
+    if not sources:
+        sys.exit(f"No LFS .sav files found in {args.source_dir}")
+
+    start = time.perf_counter()
+    for year, (rows, seconds) in ingest(sources, args.output, args.workers).items():
+        print(f"{year}: {rows} rows in {seconds:.1f}s -> {partition_path(args.output, year)}")
+    print(f"{len(sources)} year(s) in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
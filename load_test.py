@@ -0,0 +1,291 @@
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+from threading import BrokenBarrierError
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import Manager, get_context
+
+import numpy as np
+
+APPS = ['app.py', 'app2.py']
+DEFAULT_REPORT = 'load_test_report.json'
+PROFILE_WIDGETS = {
+    'age': 'Age', 'gender': 'Gender', 'marstat': 'MarStat',
+    'educ': 'Educ', 'inmig': 'Inmig', 'noc': 'NOC',
+}
+PERCENTILES = [50, 90, 95, 99]
+RSS_NOISE_BYTES = 256 * 1024
+# Longest a worker waits for the others to finish their warm-up
+BARRIER_TIMEOUT = 600
+
+
+def current_rss():
+    """
+    Returns the resident set size of this process in bytes (the peak RSS
+    where /proc is not available).
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _choose(rng, options):
+    return options[int(rng.integers(len(options)))]
+
+
+def session_flow(app_path, categories, rng, timeout=120):
+    """
+    Drives one session through the widget flow of the apps: open, select a
+    random profile, calculate, filter by year and province, show the trends
+    graph and pick a province for it. Returns the AppTest (kept alive like a
+    connected session), a list of (interaction, seconds) and the errors
+    shown after each interaction. A session stops at the first interaction
+    that raises, e.g. because its widget is missing after the app failed;
+    the exception is recorded as an error of the session.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    timings = []
+    errors = []
+
+    def timed(name, step):
+        start = time.perf_counter()
+        try:
+            step()
+        except (KeyError, StopIteration):
+            errors.append(f"{name}: widget not found")
+            raise
+        except Exception as e:
+            errors.append(f"{name}: {type(e).__name__}: {e}")
+            raise
+        timings.append((name, time.perf_counter() - start))
+        errors.extend(f"{name}: {e.value}" for e in list(at.exception) + list(at.error))
+
+    at = AppTest.from_file(os.path.abspath(app_path), default_timeout=timeout)
+    try:
+        _interactions(at, categories, rng, timed)
+    except Exception:
+        pass
+    return at, timings, errors
+
+
+def _interactions(at, categories, rng, timed):
+    timed('open', at.run)
+
+    def select_profile():
+        for key, feature in PROFILE_WIDGETS.items():
+            at.selectbox(key=key).select(_choose(rng, categories[feature]))
+        at.run()
+    timed('select_profile', select_profile)
+
+    def calculate():
+        next(b for b in at.button if b.label == "Calculate Historical Probabilities").click().run()
+    timed('calculate', calculate)
+
+    def select(key):
+        selectbox = at.selectbox(key=key)
+        selectbox.select(_choose(rng, selectbox.options[1:])).run()
+    timed('filter_year', lambda: select('year_filter'))
+    timed('filter_province', lambda: select('province_filter'))
+    timed('show_trends', lambda: at.checkbox(key='show_trends_checkbox').check().run())
+    timed('trend_province', lambda: select('graph_province_filter'))
+
+
+def latency_summary(seconds):
+    seconds = np.asarray(seconds)
+    summary = {'count': len(seconds), 'mean': float(seconds.mean()), 'max': float(seconds.max())}
+    summary.update({f"p{p}": float(v) for p, v in zip(PERCENTILES, np.percentile(seconds, PERCENTILES))})
+    return summary
+
+
+def _session_worker(app_path, categories, warmup_rngs, rngs, barrier):
+    """
+    Runs in one worker process: warms up, waits for the other workers, then
+    runs its sessions one after another, keeping every session alive.
+    Returns the timings and errors of each session, the wall-clock start and
+    end of the measured sessions and the RSS before and after them. If the
+    warm-up fails, or the workers cannot start together within
+    BARRIER_TIMEOUT, the barrier is broken so that no worker waits forever,
+    and the failure is returned as the error of each of its sessions.
+    """
+    alive = []
+    try:
+        for rng in warmup_rngs:
+            alive.append(session_flow(app_path, categories, rng)[0])
+        gc.collect()
+        rss_start = current_rss()
+        barrier.wait(timeout=BARRIER_TIMEOUT)
+    except Exception as e:
+        barrier.abort()
+        if isinstance(e, BrokenBarrierError):
+            message = "start: another worker failed or the warm-up timed out"
+        else:
+            message = f"start: {type(e).__name__}: {e}"
+        now, rss = time.time(), current_rss()
+        return {'results': [([], [message]) for _ in rngs], 'start': now, 'end': now,
+                'rss_start': rss, 'rss_end': rss}
+
+    start = time.time()
+    results = []
+    for rng in rngs:
+        at, timings, errors = session_flow(app_path, categories, rng)
+        alive.append(at)
+        results.append((timings, errors))
+    end = time.time()
+    gc.collect()
+    return {'results': results, 'start': start, 'end': end,
+            'rss_start': rss_start, 'rss_end': current_rss()}
+
+
+def run_load_test(app_path, sessions=20, concurrency=4, warmup=1, seed=0, csv_path='Book2.csv'):
+    """
+    Runs `sessions` simulated sessions of an app, `concurrency` at a time.
+    Every concurrent session has its own spawned worker process, because
+    AppTest installs a process-wide runtime for each run; the workers'
+    sessions therefore run at the same time and compete for the CPU, so the
+    latencies include that contention. Each worker first runs `warmup`
+    sessions to load the imports and its caches, and all workers start
+    their measured sessions together. Sessions stay alive until the end, as
+    connected users would. Returns the latency percentiles per interaction,
+    the errors and the RSS of all workers before and after the measured
+    sessions.
+    """
+    from coefficient_store import load_model
+
+    categories = load_model(csv_path)['categories']
+    rngs = np.random.default_rng(seed).spawn(concurrency * warmup + sessions)
+    warmup_rngs, session_rngs = rngs[:concurrency * warmup], rngs[concurrency * warmup:]
+
+    with Manager() as manager, ProcessPoolExecutor(max_workers=concurrency,
+                                                   mp_context=get_context('spawn')) as pool:
+        barrier = manager.Barrier(concurrency)
+        workers = [
+            pool.submit(_session_worker, app_path, categories,
+                        warmup_rngs[i * warmup:(i + 1) * warmup], session_rngs[i::concurrency], barrier)
+            for i in range(concurrency)
+        ]
+        workers = [worker.result() for worker in workers]
+
+    by_interaction = {}
+    errors = []
+    for worker in workers:
+        for timings, session_errors in worker['results']:
+            for name, seconds in timings:
+                by_interaction.setdefault(name, []).append(seconds)
+            errors.extend(session_errors)
+    rss_start = sum(worker['rss_start'] for worker in workers)
+    rss_end = sum(worker['rss_end'] for worker in workers)
+    return {
+        'app': app_path,
+        'sessions': sessions,
+        'concurrency': concurrency,
+        'warmup': warmup,
+        'seed': seed,
+        'wall_seconds': max(w['end'] for w in workers) - min(w['start'] for w in workers),
+        'errors': len(errors),
+        'error_messages': sorted(set(errors)),
+        'interactions': {name: latency_summary(values) for name, values in by_interaction.items()},
+        'rss': {
+            'start_bytes': rss_start,
+            'end_bytes': rss_end,
+            'per_session_bytes': (rss_end - rss_start) / max(sessions, 1),
+        },
+    }
+
+
+def run_apps(apps, **options):
+    """
+    Runs the load test of each app with its own worker processes, so that
+    the memory and caches of one app do not count towards the next.
+    """
+    return {app_path: run_load_test(app_path, **options) for app_path in apps}
+
+
+def report_measures(result):
+    """
+    Returns the measures compared across builds: the p95 latency of every
+    interaction in seconds and the RSS growth per session in bytes.
+    """
+    measures = {f"{name}/p95": summary['p95'] for name, summary in result['interactions'].items()}
+    measures['rss_per_session'] = result['rss']['per_session_bytes']
+    return measures
+
+
+def _format_measure(measure, value):
+    return f"{value / 1024:10.0f}KB" if measure == 'rss_per_session' else f"{value * 1e3:10.1f}ms"
+
+
+def compare(report, baseline, threshold):
+    """
+    Prints every measure against a previous report and returns the ones that
+    grew by more than threshold (0.5 = 50%). RSS growth is only flagged when
+    it is also larger than RSS_NOISE_BYTES per session.
+    """
+    regressions = []
+    print(f"{'measure':<40}{'baseline':>12}{'current':>12}{'ratio':>8}")
+    for app_path, result in report.items():
+        base_measures = report_measures(baseline[app_path]) if app_path in baseline else {}
+        for measure, value in report_measures(result).items():
+            name = f"{app_path}/{measure}"
+            base = base_measures.get(measure)
+            if base is None:
+                print(f"{name:<40}{'-':>12}{_format_measure(measure, value)}{'new':>8}")
+                continue
+            ratio = value / base if base > 0 else float('inf') if value > 0 else 1.0
+            flag = ''
+            noise = RSS_NOISE_BYTES if measure == 'rss_per_session' else 0
+            if ratio > 1 + threshold and value - base > noise:
+                regressions.append(name)
+                flag = '  REGRESSION'
+            print(f"{name:<40}{_format_measure(measure, base)}{_format_measure(measure, value)}{ratio:>8.2f}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive simulated concurrent sessions through the Streamlit apps.")
+    parser.add_argument('--apps', nargs='+', default=APPS)
+    parser.add_argument('--sessions', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=4,
+                        help="Sessions running at once, one worker process each")
+    parser.add_argument('--warmup', type=int, default=1, help="Warm-up sessions per worker")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--coefficients', default='Book2.csv')
+    parser.add_argument('--output', default=DEFAULT_REPORT)
+    parser.add_argument('--baseline', help="Previous report to compare with; exit 1 on a regression")
+    parser.add_argument('--threshold', type=float, default=0.5,
+                        help="Allowed growth before a measure fails (0.5 = 50%%)")
+    args = parser.parse_args()
+
+    report = run_apps(args.apps, sessions=args.sessions, concurrency=args.concurrency,
+                      warmup=args.warmup, seed=args.seed, csv_path=args.coefficients)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    for app_path, result in report.items():
+        print(f"{app_path}: {result['sessions']} sessions, {result['concurrency']} concurrent, "
+              f"{result['wall_seconds']:.1f}s, {result['errors']} errors, "
+              f"{result['rss']['per_session_bytes'] / 1024:.0f} KB RSS per session")
+        for name, summary in result['interactions'].items():
+            print(f"  {name:<18}" + ''.join(f"{f'p{p}':>6} {summary[f'p{p}'] * 1e3:8.1f}ms" for p in PERCENTILES))
+    print(f"Wrote {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} measure(s) regressed: {', '.join(regressions)}")
+            sys.exit(1)
+    if any(result['errors'] for result in report.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,80 +1,151 @@
+import hashlib
+import io
+
 import streamlit as st
 import pandas as pd
 import numpy as np
-import seaborn as sns
-import matplotlib.pyplot as plt
-import scipy.stats as stats
+
+import figure_cache
 
 # ---- Enhanced Data Preparation ----
-def prepare_data():
-    data = {
-        "Quarter": ["Q1", "Q2", "Q3", "Q4"],
-        "Product Lines": [3, 3, 4, 5],
-        "Average Price ($)": [4.99, 4.99, 5.49, 5.49],
-        "Retail Outlets": [500, 550, 600, 650],
-        "Advertising Budget": [200, 250, 300, 350],
-        "TV Ads (%)": [40, 35, 30, 25],
-        "Digital Ads (%)": [30, 35, 40, 45],
-        "Print Ads (%)": [20, 20, 20, 20],
-        "Other Ads (%)": [10, 10, 10, 10],
-        "Sales Volume": [400, 480, 580, 700],
-        "Revenue": [1996, 2395, 3184, 3843],
-        "Market Share (%)": [8, 9, 10, 11],
-    }
-    
-    # Convert to DataFrame
-    df = pd.DataFrame(data)
-
-    # Enhanced Derived Metrics
-    df["TV Ad Spend"] = df["Advertising Budget"] * (df["TV Ads (%)"] / 100)
-    df["Digital Ad Spend"] = df["Advertising Budget"] * (df["Digital Ads (%)"] / 100)
-    df["Print Ad Spend"] = df["Advertising Budget"] * (df["Print Ads (%)"] / 100)
-    df["Other Ad Spend"] = df["Advertising Budget"] * (df["Other Ads (%)"] / 100)
-    
+SAMPLE_DATA = {
+    "Quarter": ["Q1", "Q2", "Q3", "Q4"],
+    "Product Lines": [3, 3, 4, 5],
+    "Average Price ($)": [4.99, 4.99, 5.49, 5.49],
+    "Retail Outlets": [500, 550, 600, 650],
+    "Advertising Budget": [200, 250, 300, 350],
+    "TV Ads (%)": [40, 35, 30, 25],
+    "Digital Ads (%)": [30, 35, 40, 45],
+    "Print Ads (%)": [20, 20, 20, 20],
+    "Other Ads (%)": [10, 10, 10, 10],
+    "Sales Volume": [400, 480, 580, 700],
+    "Revenue": [1996, 2395, 3184, 3843],
+    "Market Share (%)": [8, 9, 10, 11],
+}
+
+AD_CHANNELS = ["TV", "Digital", "Print", "Other"]
+
+def read_quarterly_data(raw_bytes, name):
+    # Any number of quarters, one row each, from CSV or Parquet
+    if name.lower().endswith('.parquet'):
+        df = pd.read_parquet(io.BytesIO(raw_bytes))
+    else:
+        df = pd.read_csv(io.BytesIO(raw_bytes))
+    missing = [col for col in SAMPLE_DATA if col not in df.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+    df = df[list(SAMPLE_DATA)].copy()
+    # Every column but Quarter is used as a number
+    for col in list(SAMPLE_DATA)[1:]:
+        try:
+            df[col] = pd.to_numeric(df[col], errors="raise")
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"Column '{col}' must be numeric: {e}") from e
+    return df
+
+def data_hash(df):
+    return hashlib.sha256(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes()).hexdigest()
+
+@st.cache_data(show_spinner=False)
+def load_data(raw_bytes=None, name=None):
+    # Returns the base data and its hash; later steps are cached on the hash
+    if raw_bytes is None:
+        df = pd.DataFrame(SAMPLE_DATA)
+    else:
+        df = read_quarterly_data(raw_bytes, name)
+    return df, data_hash(df)
+
+@st.cache_data(show_spinner=False)
+def prepare_data(key, _df):
+    df = _df.copy()
+    budget = df["Advertising Budget"].to_numpy(dtype=np.float64)
+    revenue = df["Revenue"].to_numpy(dtype=np.float64)
+    sales = df["Sales Volume"].to_numpy(dtype=np.float64)
+
+    # Enhanced Derived Metrics: every channel's spend in one operation
+    shares = df[[f"{channel} Ads (%)" for channel in AD_CHANNELS]].to_numpy(dtype=np.float64)
+    spend = budget[:, None] * (shares / 100)
+    derived = {f"{channel} Ad Spend": spend[:, i] for i, channel in enumerate(AD_CHANNELS)}
+
     # Advanced Financial Metrics
-    df["Revenue per Ad Dollar"] = df["Revenue"] / df["Advertising Budget"]
-    df["Sales per Retail Outlet"] = df["Sales Volume"] / df["Retail Outlets"]
-    df["Revenue per Product Line"] = df["Revenue"] / df["Product Lines"]
-    df["Profit Margin (%)"] = ((df["Revenue"] - df["Advertising Budget"]) / df["Revenue"]) * 100
-    df["Ad Efficiency Ratio"] = df["Sales Volume"] / df["Advertising Budget"]
-    
+    derived["Revenue per Ad Dollar"] = revenue / budget
+    derived["Sales per Retail Outlet"] = sales / df["Retail Outlets"].to_numpy(dtype=np.float64)
+    derived["Revenue per Product Line"] = revenue / df["Product Lines"].to_numpy(dtype=np.float64)
+    derived["Profit Margin (%)"] = ((revenue - budget) / revenue) * 100
+    derived["Ad Efficiency Ratio"] = sales / budget
+
     # Cumulative and Growth Metrics
-    df["Cumulative Revenue"] = df["Revenue"].cumsum()
-    df["Revenue Growth (%)"] = df["Revenue"].pct_change() * 100
-    df["Sales Volume Growth (%)"] = df["Sales Volume"].pct_change() * 100
-    
-    return df
+    derived["Cumulative Revenue"] = df["Revenue"].cumsum().to_numpy()
+    growth = np.full((len(df), 2), np.nan)
+    levels = np.column_stack([revenue, sales])
+    growth[1:] = (levels[1:] / levels[:-1] - 1) * 100
+    derived["Revenue Growth (%)"] = growth[:, 0]
+    derived["Sales Volume Growth (%)"] = growth[:, 1]
+
+    return pd.concat([df, pd.DataFrame(derived, index=df.index)], axis=1)
 
 # Statistical Analysis Functions
-def perform_statistical_analysis(df):
-    # Regression Analysis
-    from sklearn.linear_model import LinearRegression
-    X = df[['Advertising Budget']]
-    y_revenue = df['Revenue']
-    y_sales = df['Sales Volume']
-    
-    reg_revenue = LinearRegression().fit(X, y_revenue)
-    reg_sales = LinearRegression().fit(X, y_sales)
-    
-    # Hypothesis Testing
-    ad_budget_revenue_correlation = stats.pearsonr(df['Advertising Budget'], df['Revenue'])
-    ad_budget_sales_correlation = stats.pearsonr(df['Advertising Budget'], df['Sales Volume'])
-    
+def budget_regressions(df, targets):
+    # Least squares and Pearson correlation of every target on the
+    # advertising budget. Targets with the same missing rows (the growth
+    # metrics have no first quarter) are solved together in one call.
+    from scipy.special import betainc
+
+    x = df['Advertising Budget'].to_numpy(dtype=np.float64)
+    Y = df[targets].to_numpy(dtype=np.float64)
+    results = np.full((len(targets), 4), np.nan)
+    missing = np.isnan(Y) | np.isnan(x)[:, None]
+    groups = {}
+    for j in range(len(targets)):
+        groups.setdefault(np.packbits(missing[:, j]).tobytes(), []).append(j)
+    for cols in groups.values():
+        rows = ~missing[:, cols[0]]
+        xs, Ys = x[rows], Y[rows][:, cols]
+        n = len(xs)
+        if n < 2:
+            continue
+        X = np.column_stack([np.ones(n), xs])
+        (intercepts, slopes), *_ = np.linalg.lstsq(X, Ys, rcond=None)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            xc = xs - xs.mean()
+            Yc = Ys - Ys.mean(axis=0)
+            r = np.clip((xc @ Yc) / np.sqrt((xc @ xc) * (Yc * Yc).sum(axis=0)), -1.0, 1.0)
+            # Two-sided p-value of the t test on r with n - 2 degrees of freedom
+            dof = n - 2
+            p_values = betainc(dof / 2, 0.5, 1 - r * r) if dof > 0 else np.nan
+        results[cols] = np.column_stack([slopes, intercepts, r, np.broadcast_to(p_values, r.shape)])
+
+    return pd.DataFrame(results, columns=['Slope', 'Intercept', 'Correlation', 'P-Value'],
+                        index=pd.Index(targets, name='Metric'))
+
+@st.cache_data(show_spinner=False)
+def perform_statistical_analysis(key, _df):
+    targets = [col for col in _df.select_dtypes('number').columns if col != 'Advertising Budget']
+    regressions = budget_regressions(_df, targets)
     return {
-        'Revenue Regression Coefficient': reg_revenue.coef_[0],
-        'Sales Volume Regression Coefficient': reg_sales.coef_[0],
-        'Revenue-Ad Budget Correlation': ad_budget_revenue_correlation[0],
-        'Sales-Ad Budget Correlation': ad_budget_sales_correlation[0],
-        'Correlation P-Value': ad_budget_revenue_correlation[1]
-    }
+        'Revenue Regression Coefficient': regressions.loc['Revenue', 'Slope'],
+        'Sales Volume Regression Coefficient': regressions.loc['Sales Volume', 'Slope'],
+        'Revenue-Ad Budget Correlation': regressions.loc['Revenue', 'Correlation'],
+        'Sales-Ad Budget Correlation': regressions.loc['Sales Volume', 'Correlation'],
+        'Correlation P-Value': regressions.loc['Revenue', 'P-Value']
+    }, regressions
 
 # Streamlit Dashboard
 def main():
     st.set_page_config(page_title="Marketing Analytics Dashboard", layout="wide")
     
     # Data Preparation
-    df = prepare_data()
-    stats_results = perform_statistical_analysis(df)
+    uploaded = st.sidebar.file_uploader("Quarterly data (CSV or Parquet)", type=['csv', 'parquet'])
+    try:
+        if uploaded is not None:
+            base_df, key = load_data(uploaded.getvalue(), uploaded.name)
+        else:
+            base_df, key = load_data()
+    except ValueError as e:
+        st.sidebar.error(str(e))
+        base_df, key = load_data()
+    df = prepare_data(key, base_df)
     
     # Dashboard Title and Navigation
     st.title("🌿 GreenGrow Organic Foods: Marketing Performance Dashboard")
@@ -116,8 +187,12 @@ def main():
     elif selected_analysis == "Statistical Insights":
         st.header("📈 Advanced Statistical Analysis")
         st.write("### Key Statistical Findings")
+        stats_results, regressions = perform_statistical_analysis(key, df)
         for metric, value in stats_results.items():
             st.metric(metric, f"{value:.4f}")
+
+        st.write("### Every Metric against Advertising Budget")
+        st.dataframe(regressions)
     
     elif selected_analysis == "Advertising Analysis":
         st.header("📣 Advertising Channel Performance")
@@ -135,11 +210,21 @@ def main():
         st.subheader("Performance Correlation Heatmap")
         corr_columns = ['Advertising Budget', 'Sales Volume', 'Revenue', 
                         'Market Share (%)', 'Ad Efficiency Ratio']
-        corr_matrix = df[corr_columns].corr()
-        
-        fig, ax = plt.subplots(figsize=(10, 8))
-        sns.heatmap(corr_matrix, annot=True, cmap='coolwarm', linewidths=0.5, fmt=".2f", square=True, ax=ax)
-        st.pyplot(fig)
+
+        def render_heatmap():
+            corr_matrix = df[corr_columns].corr()
+
+            # The plotting stack is only imported when the heatmap is drawn
+            import matplotlib.pyplot as plt
+            import seaborn as sns
+
+            fig, ax = plt.subplots(figsize=(10, 8))
+            sns.heatmap(corr_matrix, annot=True, cmap='coolwarm', linewidths=0.5, fmt=".2f", square=True, ax=ax)
+            return figure_cache.png_bytes(fig)
+
+        # Drawn once per data set; repeat visits show the cached PNG
+        heatmap = figure_cache.get_or_render(figure_cache.figure_key('heatmap', key, corr_columns), render_heatmap)
+        st.image(heatmap, width='stretch')
 
 if __name__ == "__main__":
     main()
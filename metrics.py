@@ -0,0 +1,173 @@
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from logging.handlers import RotatingFileHandler
+
+# The JSONL log is off unless a path is given, e.g. METRICS_LOG=phase_timings.jsonl
+METRICS_LOG = os.environ.get('METRICS_LOG')
+METRICS_LOG_MAX_BYTES = int(os.environ.get('METRICS_LOG_MAX_BYTES', 10 * 1024 * 1024))
+METRICS_LOG_BACKUPS = int(os.environ.get('METRICS_LOG_BACKUPS', 5))
+METRICS_PORT = os.environ.get('METRICS_PORT')
+
+BUCKETS = [0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+
+_local = threading.local()
+_lock = threading.Lock()
+_histograms = {}
+_counters = {}
+_logger = None
+_server = None
+_server_failed = False
+
+log = logging.getLogger(__name__)
+
+
+def _get_logger():
+    global _logger
+    with _lock:
+        if _logger is None:
+            logger = logging.getLogger('labor_market_calculator.metrics')
+            logger.propagate = False
+            logger.setLevel(logging.INFO)
+            handler = RotatingFileHandler(METRICS_LOG, maxBytes=METRICS_LOG_MAX_BYTES,
+                                          backupCount=METRICS_LOG_BACKUPS)
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            logger.addHandler(handler)
+            _logger = logger
+    return _logger
+
+
+def _observe(app, phase, seconds):
+    with _lock:
+        histogram = _histograms.setdefault((app, phase), [[0] * len(BUCKETS), 0.0, 0])
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                histogram[0][i] += 1
+        histogram[1] += seconds
+        histogram[2] += 1
+
+
+def _count(name, labels, value=1):
+    with _lock:
+        key = (name, tuple(sorted(labels.items())))
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def start_rerun(app):
+    """
+    Starts collecting phase timings for one script run in this thread.
+    """
+    _local.rerun = {'app': app, 'started': time.time(), 'phases': []}
+    _local.clock = time.perf_counter()
+
+
+def end_rerun():
+    """
+    Finishes the current run: records its total time and, when METRICS_LOG
+    is set, appends the run with all of its phases as one line of the
+    rotating JSONL log.
+    """
+    rerun = getattr(_local, 'rerun', None)
+    if rerun is None:
+        return
+    _local.rerun = None
+    seconds = time.perf_counter() - _local.clock
+    rerun['total_ms'] = round(seconds * 1000, 3)
+    _observe(rerun['app'], 'total', seconds)
+    _count('reruns_total', {'app': rerun['app']})
+    if METRICS_LOG:
+        _get_logger().info(json.dumps(rerun))
+
+
+@contextmanager
+def span(phase):
+    """
+    Times a phase of the current run. The yielded dict can be given extra
+    fields such as rows or cache_hit, which are logged with the phase.
+    Outside of a run (start_rerun not called) phases are not recorded.
+    """
+    fields = {}
+    start = time.perf_counter()
+    try:
+        yield fields
+    finally:
+        seconds = time.perf_counter() - start
+        rerun = getattr(_local, 'rerun', None)
+        if rerun is not None:
+            rerun['phases'].append(dict(phase=phase, ms=round(seconds * 1000, 3), **fields))
+            app = rerun['app']
+            _observe(app, phase, seconds)
+            if 'rows' in fields:
+                _count('rows_total', {'app': app, 'phase': phase}, fields['rows'])
+            if 'cache_hit' in fields:
+                result = 'hit' if fields['cache_hit'] else 'miss'
+                _count('cache_requests_total', {'app': app, 'phase': phase, 'result': result})
+
+
+def _format_labels(labels):
+    return ','.join(f'{name}="{value}"' for name, value in labels)
+
+
+def prometheus_text():
+    """
+    Returns all counters and phase histograms in the Prometheus text format.
+    """
+    lines = []
+    with _lock:
+        counters = dict(_counters)
+        histograms = {key: (list(h[0]), h[1], h[2]) for key, h in _histograms.items()}
+
+    for name in sorted({name for name, _ in counters}):
+        lines.append(f"# TYPE labor_{name} counter")
+        for (counter_name, labels), value in sorted(counters.items()):
+            if counter_name == name:
+                lines.append(f"labor_{name}{{{_format_labels(labels)}}} {value}")
+
+    lines.append("# TYPE labor_phase_seconds histogram")
+    for (app, phase), (buckets, total, count) in sorted(histograms.items()):
+        labels = f'app="{app}",phase="{phase}"'
+        for bound, value in zip(BUCKETS, buckets):
+            lines.append(f'labor_phase_seconds_bucket{{{labels},le="{bound}"}} {value}')
+        lines.append(f'labor_phase_seconds_bucket{{{labels},le="+Inf"}} {count}')
+        lines.append(f"labor_phase_seconds_sum{{{labels}}} {total}")
+        lines.append(f"labor_phase_seconds_count{{{labels}}} {count}")
+    return '\n'.join(lines) + '\n'
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = prometheus_text().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(port=METRICS_PORT, host='127.0.0.1'):
+    """
+    Serves prometheus_text() on http://host:port/ from a daemon thread.
+    Does nothing when no port is configured or the server already runs.
+    If the port cannot be bound the error is logged once and the app runs
+    without the endpoint.
+    """
+    global _server, _server_failed
+    if port is None:
+        return None
+    with _lock:
+        if _server is None and not _server_failed:
+            try:
+                _server = ThreadingHTTPServer((host, int(port)), _MetricsHandler)
+            except OSError as e:
+                _server_failed = True
+                log.warning("Metrics server not started on %s:%s: %s", host, port, e)
+                return None
+            threading.Thread(target=_server.serve_forever, daemon=True).start()
+    return _server
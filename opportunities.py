@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+
+from scoring import FEATURES, LOCATION_FEATURES, logistic_percent
+
+SEARCH_FEATURES = FEATURES + LOCATION_FEATURES
+# Combinations scored per year, counting the averaged Province and Quarter.
+# Searching over everything is 1.2 million; this cap keeps the largest
+# allowed search, averaged over all years, well under 100 ms.
+MAX_SEARCH_CELLS = 250_000
+
+
+def search_size(model, profile, free):
+    """
+    Returns the number of combinations scored per year for a search: the
+    product of the category counts of the free features and of the features
+    averaged over.
+    """
+    return int(np.prod([len(model['categories'][feature]) for feature in SEARCH_FEATURES
+                        if feature in free or feature not in profile]))
+
+
+def combination_scores(model, profile, free, year='All'):
+    """
+    Scores every combination of the free features in one broadcasted pass.
+    Features in profile are held at their value; any other feature that is
+    not free is averaged over, and year='All' averages over the years.
+    Returns the free features in canonical order and an array with one axis
+    per free feature holding the probability in percent. Raises ValueError
+    for searches of more than MAX_SEARCH_CELLS combinations per year.
+    """
+    free = [feature for feature in SEARCH_FEATURES if feature in free]
+    size = search_size(model, profile, free)
+    if size > MAX_SEARCH_CELLS:
+        raise ValueError(f"Searching over {', '.join(free)} means {size:,} combinations per year; "
+                         f"at most {MAX_SEARCH_CELLS:,} are searched. Choose fewer attributes.")
+    averaged = [feature for feature in SEARCH_FEATURES if feature not in free and feature not in profile]
+    axes = free + averaged
+    years = range(len(model['years'])) if year == 'All' else [model['years'].index(year)]
+
+    # Every year is scored into the same buffer and summed in place
+    shape = [len(model['categories'][feature]) for feature in axes]
+    total = np.zeros(shape)
+    scores = np.empty(shape)
+    for y in years:
+        # Terms are added in the order score_profile adds them, so a single
+        # combination gets exactly the probability shown in the results table.
+        logit = model['intercept'][y]
+        for feature in SEARCH_FEATURES:
+            coefficients = model['coefficients'][feature][y]
+            if feature in axes:
+                term_shape = [1] * len(axes)
+                term_shape[axes.index(feature)] = -1
+                term = coefficients.reshape(term_shape)
+            else:
+                term = coefficients[model['index'][feature][profile[feature]]]
+            if feature == SEARCH_FEATURES[-1]:
+                logit = np.add(logit, term, out=scores)
+            else:
+                logit = logit + term
+        total += logistic_percent(logit, out=scores)
+
+    scores = total / len(years)
+    if averaged:
+        scores = scores.mean(axis=tuple(range(len(free), len(axes))))
+    return free, np.asarray(scores)
+
+
+def top_combinations(model, profile, free, year='All', k=10):
+    """
+    Returns the k combinations of the free features with the highest
+    probability for a year (or averaged over all years) as a DataFrame, best
+    first. Only the k best are selected and sorted, not the whole
+    combination space; ties keep the category order of the coefficients.
+    Raises ValueError for searches larger than MAX_SEARCH_CELLS.
+    """
+    free, scores = combination_scores(model, profile, free, year)
+    flat = scores.reshape(-1)
+    k = min(k, flat.size)
+    if k < flat.size:
+        kth = np.partition(flat, flat.size - k)[flat.size - k]
+        candidates = np.flatnonzero(flat >= kth)
+    else:
+        candidates = np.arange(flat.size)
+    best = candidates[np.lexsort((candidates, -flat[candidates]))][:k]
+
+    positions = np.unravel_index(best, scores.shape) if free else ()
+    top = pd.DataFrame({
+        feature: np.asarray(model['categories'][feature], dtype=object)[position]
+        for feature, position in zip(free, positions)
+    })
+    top['Probability'] = np.round(flat[best], 2)
+    return top
@@ -0,0 +1,151 @@
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from lfs_ingest import DEFAULT_OUTPUT, available_years, load_labels, partition_path
+
+
+def stratum_counts(chunks, columns):
+    """
+    Counts the rows of every combination of columns over all chunks.
+    Missing values count as a category of their own.
+    """
+    counts = None
+    for chunk in chunks:
+        chunk_counts = chunk.groupby(columns, dropna=False, observed=True).size()
+        counts = chunk_counts if counts is None else counts.add(chunk_counts, fill_value=0)
+    if counts is None:
+        raise ValueError("No rows to rebalance")
+    return counts.astype(np.int64).sort_index()
+
+
+def sample_sizes(counts, label, ratio=(1.0, 1.2), seed=0):
+    """
+    Returns how many rows to keep of each (stratum, label) cell. In every
+    stratum the rarest label is kept whole and each other label is cut down
+    to at most the rarest count times a ratio drawn uniformly from ratio,
+    one draw per stratum.
+    """
+    strata = [name for name in counts.index.names if name != label]
+    if strata:
+        smallest = counts.groupby(level=strata, dropna=False).transform('min')
+        stratum_ids = counts.index.droplevel(label).factorize()[0]
+    else:
+        smallest = pd.Series(counts.min(), index=counts.index)
+        stratum_ids = np.zeros(len(counts), dtype=np.int64)
+    draws = np.random.default_rng(seed).uniform(ratio[0], ratio[1], stratum_ids.max() + 1)
+    limit = (smallest.to_numpy() * draws[stratum_ids]).astype(np.int64)
+    return pd.Series(np.minimum(counts.to_numpy(), limit), index=counts.index)
+
+
+def rebalance(chunk_source, strata, label, ratio=(1.0, 1.2), seed=0):
+    """
+    Stratified downsampling of a dataset too large to load at once.
+    chunk_source() must return a fresh iterator of DataFrame chunks; it is
+    read twice, first to count the strata and then to select rows. Yields
+    the kept rows of each chunk in their original order.
+
+    Every cell keeps a uniform random subset of exactly the size given by
+    sample_sizes: each chunk takes a hypergeometric share of what the cell
+    still needs, so only one chunk is held in memory at a time. The output
+    is reproducible for the same input, chunking and seed.
+    """
+    columns = list(strata) + [label]
+    counts = stratum_counts(chunk_source(), columns)
+    remaining = counts.to_numpy().copy()
+    needed = sample_sizes(counts, label, ratio, seed).to_numpy().copy()
+    rng = np.random.default_rng([seed, 1])
+
+    for chunk in chunk_source():
+        if len(columns) > 1:
+            keys = pd.MultiIndex.from_frame(chunk[columns])
+        else:
+            keys = pd.Index(chunk[label])
+        cells = counts.index.get_indexer(keys)
+        in_chunk = np.bincount(cells, minlength=len(counts))
+        present = np.flatnonzero(in_chunk)
+        taken = np.zeros(len(counts), dtype=np.int64)
+        taken[present] = rng.hypergeometric(needed[present], remaining[present] - needed[present],
+                                            in_chunk[present])
+
+        # Keep the rows that rank among the first `taken` of their cell in a random order.
+        order = np.lexsort((rng.random(len(chunk)), cells))
+        starts = np.cumsum(in_chunk) - in_chunk
+        rank = np.empty(len(chunk), dtype=np.int64)
+        rank[order] = np.arange(len(chunk)) - starts[cells[order]]
+        keep = rank < taken[cells]
+
+        remaining -= in_chunk
+        needed -= taken
+        if keep.any():
+            yield chunk[keep]
+
+
+def lfs_chunks(root, years, columns, batch_size=500_000):
+    """
+    Returns a chunk source over the LFS Parquet partitions of some years:
+    each chunk holds the requested code columns, a year column and the
+    Has_a_job flag derived from LFSSTAT.
+    """
+    import pyarrow.parquet as pq
+
+    from fit_models import EMPLOYED
+
+    read_columns = sorted(set(columns) - {'year', 'Has_a_job'} | {'LFSSTAT'})
+
+    def chunks():
+        for year in years:
+            employed = [code for code, label in load_labels(root, year)['LFSSTAT'].items()
+                        if label in EMPLOYED]
+            parquet = pq.ParquetFile(partition_path(root, year))
+            for batch in parquet.iter_batches(batch_size=batch_size, columns=read_columns):
+                chunk = batch.to_pandas()
+                chunk['year'] = np.int16(year)
+                chunk['Has_a_job'] = chunk['LFSSTAT'].isin(employed).astype(np.int8)
+                yield chunk
+    return chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stratified downsampling of the LFS Parquet data.")
+    parser.add_argument('output', help="Parquet file to write")
+    parser.add_argument('--data', default=DEFAULT_OUTPUT)
+    parser.add_argument('--years', type=int, nargs='*')
+    parser.add_argument('--strata', nargs='+', default=['NOC_10'])
+    parser.add_argument('--label', default='Has_a_job')
+    parser.add_argument('--columns', nargs='*', default=['PROV', 'AGE_12', 'SEX', 'MARSTAT', 'EDUC', 'IMMIG',
+                                                         'NOC_10', 'SURVMNTH'])
+    parser.add_argument('--ratio', type=float, nargs=2, default=[1.0, 1.2],
+                        help="Range of the per-stratum ratio of larger to smallest label counts")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--batch-size', type=int, default=500_000)
+    args = parser.parse_args()
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    years = args.years or available_years(args.data)
+    columns = list(dict.fromkeys(args.columns + args.strata + [args.label, 'year']))
+    source = lfs_chunks(args.data, years, columns, args.batch_size)
+
+    start = time.perf_counter()
+    rows = 0
+    writer = None
+    try:
+        for chunk in rebalance(source, args.strata, args.label, tuple(args.ratio), args.seed):
+            table = pa.Table.from_pandas(chunk[columns], preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(args.output, table.schema)
+            writer.write_table(table)
+            rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    print(f"Wrote {rows} rows to {args.output} in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
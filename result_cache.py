@@ -0,0 +1,121 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from scoring import FEATURES
+
+DEFAULT_MAX_BYTES = int(os.environ.get('RESULT_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+
+_entries = OrderedDict()
+_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'bytes': 0, 'max_bytes': DEFAULT_MAX_BYTES}
+
+
+def profile_key(model, selected_profile):
+    """
+    Returns the cache key of a profile: the hash of the coefficients followed
+    by the profile's categories in FEATURES order.
+    """
+    return (model['source_sha256'],) + tuple(selected_profile[f] for f in FEATURES)
+
+
+def value_bytes(value):
+    """
+    Estimates the memory held by a cached value: DataFrames, arrays, Arrow
+    tables, and dicts, lists or tuples of them.
+    """
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, np.ndarray) or isinstance(getattr(value, 'nbytes', None), int):
+        # Arrays and Arrow tables
+        return value.nbytes
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(value_bytes(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(value_bytes(v) for v in value)
+    return sys.getsizeof(value)
+
+
+def shared_copy(value):
+    """
+    Returns a cached value as handed out to a caller. DataFrames and Series,
+    also inside dicts, lists and tuples, are returned as shallow copies:
+    with pandas 3 copy-on-write they share their data with the cache until
+    written to, so a caller's writes never reach the cached results.
+    Arrays are stored read-only and returned as they are.
+    """
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.copy(deep=False)
+    if isinstance(value, dict):
+        return {k: shared_copy(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(shared_copy(v) for v in value)
+    return value
+
+
+def _evict():
+    while _stats['bytes'] > _stats['max_bytes'] and _entries:
+        _, (_, size) = _entries.popitem(last=False)
+        _stats['bytes'] -= size
+        _stats['evictions'] += 1
+
+
+def set_max_bytes(max_bytes):
+    with _lock:
+        _stats['max_bytes'] = max_bytes
+        _evict()
+
+
+def lookup(key):
+    """
+    Returns the cached results for key, or None on a miss.
+    Results are shared by every session in the process; frames are returned
+    through shared_copy.
+    """
+    with _lock:
+        entry = _entries.get(key)
+        if entry is None:
+            _stats['misses'] += 1
+            return None
+        _entries.move_to_end(key)
+        _stats['hits'] += 1
+    return shared_copy(entry[0])
+
+
+def store(key, value):
+    """
+    Caches value under key and returns it. Least recently used entries are
+    evicted once the cache holds more than max_bytes.
+    """
+    size = value_bytes(value)
+    with _lock:
+        if key not in _entries:
+            _entries[key] = (value, size)
+            _stats['bytes'] += size
+            _evict()
+    return shared_copy(value)
+
+
+def get_or_compute(key, compute):
+    """
+    Returns the cached results for key, calling compute() on a miss.
+    """
+    value = lookup(key)
+    if value is None:
+        value = store(key, compute())
+    return value
+
+
+def cache_stats():
+    with _lock:
+        return dict(_stats, entries=len(_entries))
+
+
+def clear():
+    with _lock:
+        _entries.clear()
+        _stats['bytes'] = 0
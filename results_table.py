@@ -0,0 +1,50 @@
+import math
+
+INDEX_COLUMNS = ['Year', 'Province', 'Quarter']
+
+SORT_OPTIONS = {
+    'Year, highest probability first': (['Year', 'Probability'], [True, False]),
+    'Highest probability first': (['Probability'], [False]),
+    'Lowest probability first': (['Probability'], [True]),
+    'Province': (['Province', 'Year', 'Quarter'], [True, True, True]),
+    'Year and quarter': (['Year', 'Quarter', 'Province'], [True, True, True]),
+}
+
+PAGE_SIZES = [25, 50, 100, 250]
+
+
+def index_table(results_df):
+    """
+    Returns the results indexed and sorted by (Year, Province, Quarter) so
+    that year and province filters are slices of the index.
+    """
+    return results_df.set_index(INDEX_COLUMNS).sort_index()
+
+
+def select_rows(table_index, year='All', province='All'):
+    """
+    Returns the rows of an indexed table for a year and province, where
+    'All' leaves that level unfiltered.
+    """
+    if year == 'All' and province == 'All':
+        return table_index
+    # Slices rather than labels keep every index level in the result.
+    key = (slice(None) if year == 'All' else slice(year, year),
+           slice(None) if province == 'All' else slice(province, province))
+    return table_index.loc[key, :]
+
+
+def page_count(n_rows, page_size):
+    return max(1, math.ceil(n_rows / page_size))
+
+
+def table_page(rows, sort_option, page_number, page_size):
+    """
+    Sorts the selected rows and returns only the requested page (numbered
+    from 1) as a flat DataFrame ready to display.
+    """
+    columns, ascending = SORT_OPTIONS[sort_option]
+    rows = rows.reset_index()
+    order = rows.sort_values(columns, ascending=ascending, kind='stable').index
+    start = (page_number - 1) * page_size
+    return rows.loc[order[start:start + page_size], INDEX_COLUMNS + ['Probability']]
@@ -0,0 +1,270 @@
+import numpy as np
+import pandas as pd
+
+from coefficient_store import load_model
+from results_table import index_table
+from trends import trend_frame
+
+FEATURES = ['Age', 'Gender', 'MarStat', 'Educ', 'Inmig', 'NOC']
+LOCATION_FEATURES = ['Province', 'Quarter']
+
+# Complete list of Canadian provinces and territories shown on the map
+ALL_PROVINCES = [
+    'Alberta', 'British Columbia', 'Manitoba', 'New Brunswick',
+    'Newfoundland and Labrador', 'Northwest Territories', 'Nova Scotia',
+    'Nunavut', 'Ontario', 'Prince Edward Island', 'Quebec', 'Saskatchewan',
+    'Yukon'
+]
+
+
+def load_coefficient_data(csv_path):
+    """
+    Loads and structures coefficients from the CSV file.
+    Returns a dictionary of dictionaries by year.
+    The coefficients come from the compiled store, so the CSV is only parsed
+    again when it changes.
+    """
+    model = load_model(csv_path)
+    coefficients_by_year = {}
+
+    for y, year in enumerate(model['years']):
+        coefficients = {'Intercept': model['intercept'][y]}
+        for feature, labels in model['categories'].items():
+            coefficients[feature] = dict(zip(labels, model['coefficients'][feature][y]))
+        coefficients_by_year[year] = coefficients
+
+    return coefficients_by_year
+
+
+def build_model(coefficients_by_year):
+    """
+    Converts the dictionary returned by load_coefficient_data into dense arrays.
+    The intercept is a vector indexed by year and every feature is a
+    (year x category) matrix whose columns follow the category order of the CSV.
+    """
+    years = list(coefficients_by_year.keys())
+    first_year = coefficients_by_year[years[0]]
+
+    categories = {
+        feature: list(values.keys())
+        for feature, values in first_year.items()
+        if feature != 'Intercept'
+    }
+    coefficients = {
+        feature: np.array([
+            [coefficients_by_year[year][feature][category] for category in labels]
+            for year in years
+        ], dtype=np.float64)
+        for feature, labels in categories.items()
+    }
+
+    return {
+        'years': years,
+        'intercept': np.array([coefficients_by_year[year]['Intercept'] for year in years],
+                              dtype=np.float64),
+        'categories': categories,
+        'index': {
+            feature: {category: i for i, category in enumerate(labels)}
+            for feature, labels in categories.items()
+        },
+        'coefficients': coefficients,
+    }
+
+
+def profile_logit(model, selected_profile):
+    """
+    Returns the logit of a profile for every year, before the province and
+    quarter terms are added. Terms are summed in the same order as the
+    original per-cell loop so the results match it exactly.
+    """
+    logit = model['intercept'].copy()
+    for feature, category in selected_profile.items():
+        logit += model['coefficients'][feature][:, model['index'][feature][category]]
+    return logit
+
+
+def logistic_percent(logit, out=None):
+    """
+    Converts logits into probabilities in percent rounded to two decimals.
+    With out (which may be logit itself), the same operations are done in
+    place in out instead of in new arrays.
+    """
+    if out is None:
+        odds = np.exp(logit)
+        return np.round((odds / (1 + odds)) * 100, 2)
+    odds = np.exp(logit, out=out)
+    np.divide(odds, 1 + odds, out=odds)
+    np.multiply(odds, 100, out=odds)
+    return np.round(odds, 2, out=odds)
+
+
+def score_profile(model, selected_profile):
+    """
+    Scores a profile over every year, province and quarter in one broadcasted
+    operation. Returns an array of shape (years, provinces, quarters).
+    """
+    logit = profile_logit(model, selected_profile)[:, None, None]
+    logit = logit + model['coefficients']['Province'][:, :, None]
+    logit = logit + model['coefficients']['Quarter'][:, None, :]
+    return logistic_percent(logit)
+
+
+def score_profiles(model, profiles):
+    """
+    Scores many profiles in one broadcasted operation. Returns an array of
+    shape (profiles, years, provinces, quarters) whose rows equal
+    score_profile for each profile.
+    """
+    logit = model['intercept'][None, :]
+    for feature in FEATURES:
+        codes = encode_column(model, feature, [profile[feature] for profile in profiles])
+        logit = logit + model['coefficients'][feature][:, codes].T
+    logit = logit[:, :, None, None] + model['coefficients']['Province'][None, :, :, None]
+    logit = logit + model['coefficients']['Quarter'][None, :, None, :]
+    return logistic_percent(logit)
+
+
+def result_order(model, probabilities):
+    """
+    Returns the flat positions of a (years, provinces, quarters) tensor sorted
+    by year and descending probability, keeping the tensor order among ties.
+    """
+    n_years = probabilities.shape[0]
+    year_rank = np.argsort(np.argsort(model['years'], kind='stable'))
+    year_key = np.repeat(year_rank, probabilities.size // n_years)
+    return np.lexsort((-probabilities.reshape(-1), year_key))
+
+
+def results_frame(model, probabilities):
+    """
+    Lays out a (years, provinces, quarters) probability tensor as the results
+    table shown by the apps, sorted by year and descending probability.
+    """
+    provinces = model['categories']['Province']
+    quarters = model['categories']['Quarter']
+    n_years, n_provinces, n_quarters = probabilities.shape
+
+    results_df = pd.DataFrame({
+        'Year': np.repeat(model['years'], n_provinces * n_quarters),
+        'Province': np.tile(np.repeat(provinces, n_quarters), n_years),
+        'Quarter': np.tile(quarters, n_years * n_provinces),
+        'Probability': probabilities.reshape(-1),
+    })
+    return results_df.iloc[result_order(model, probabilities)]
+
+
+def results_records(model, probabilities):
+    """
+    Returns the same rows as results_frame as a list of plain dictionaries,
+    without building a DataFrame.
+    """
+    order = result_order(model, probabilities)
+    years, provinces, quarters = np.unravel_index(order, probabilities.shape)
+    year_labels = model['years']
+    province_labels = model['categories']['Province']
+    quarter_labels = model['categories']['Quarter']
+    return [
+        {'Year': year_labels[y], 'Province': province_labels[p],
+         'Quarter': quarter_labels[q], 'Probability': value}
+        for y, p, q, value in zip(years.tolist(), provinces.tolist(), quarters.tolist(),
+                                  probabilities.reshape(-1)[order].tolist())
+    ]
+
+
+def build_results(model, probabilities):
+    """
+    Bundles the results table of a profile, a copy indexed by (Year, Province,
+    Quarter) and the aggregates the apps show for it, so that changing a
+    filter is a lookup rather than a groupby:
+    sorted option lists, the mean probability of every province per year and
+    over all years ('All'), the (min, max) of those means, the series
+    for the trend graphs in period order (downsampled for the 'All' view),
+    and the probability tensor itself, read-only.
+    """
+    probabilities.setflags(write=False)
+    year_means = probabilities.mean(axis=2)
+    province_means = {'All': probabilities.mean(axis=(0, 2))}
+    province_means.update(zip(model['years'], year_means))
+    for means in province_means.values():
+        means.setflags(write=False)
+
+    results_df = results_frame(model, probabilities)
+    trend, trend_all = trend_frame(model, probabilities)
+    return {
+        'table': results_df,
+        'table_index': index_table(results_df),
+        'year_options': sorted(model['years']),
+        'province_options': sorted(model['categories']['Province']),
+        'provinces': model['categories']['Province'],
+        'province_means': province_means,
+        'mean_range': {
+            year: (float(means.min()), float(means.max()))
+            for year, means in province_means.items()
+        },
+        'trend': trend,
+        'trend_all': trend_all,
+        'probabilities': probabilities,
+    }
+
+
+def province_averages(results, year='All', province='All'):
+    """
+    Returns the mean probability per province for a year (or 'All') as a
+    Series, restricted to one province unless province is 'All', together
+    with the (min, max) of the values shown.
+    """
+    means = pd.Series(results['province_means'][year], index=results['provinces'])
+    if province == 'All':
+        return means, results['mean_range'][year]
+    value = means[province]
+    return means[[province]], (value, value)
+
+
+def province_frame(averages):
+    """
+    Lays out average probabilities indexed by province as one row per
+    province or territory, NaN where there is no data.
+    """
+    return pd.DataFrame({
+        'Province': ALL_PROVINCES,
+        'Probability': averages.reindex(ALL_PROVINCES).to_numpy()
+    })
+
+
+def province_map_frame(results, year='All', province='All'):
+    """
+    Returns the choropleth data for a result: one row per province or
+    territory with its average probability (NaN where there is no data),
+    and the (min, max) to use for the color scale.
+    """
+    averages, color_range = province_averages(results, year, province)
+    return province_frame(averages), color_range
+
+
+def encode_column(model, feature, values):
+    """
+    Converts category labels into integer codes for a feature. Years are
+    matched as strings so integer Year columns work as well.
+    """
+    labels = model['years'] if feature == 'Year' else model['categories'][feature]
+    values = pd.Series(values)
+    if feature == 'Year':
+        values = values.astype(str)
+    codes = pd.Categorical(values, categories=labels).codes
+    if (codes < 0).any():
+        unknown = sorted(set(values[codes < 0].astype(str)))
+        raise ValueError(f"Unknown {feature} values: {', '.join(unknown[:5])}")
+    return codes
+
+
+def score_rows(model, codes):
+    """
+    Scores one row per entry of the integer code arrays in `codes`, which maps
+    'Year' and every feature (including Province and Quarter) to codes as
+    returned by encode_column. Returns probabilities in percent.
+    """
+    years = codes['Year']
+    logit = model['intercept'][years]
+    for feature in FEATURES + LOCATION_FEATURES:
+        logit = logit + model['coefficients'][feature][years, codes[feature]]
+    return logistic_percent(logit)
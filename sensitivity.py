@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+
+from scoring import FEATURES, logistic_percent
+
+
+def profile_variants(model, features=FEATURES):
+    """
+    Returns every single-attribute change as (attribute, value) pairs in
+    category order. They do not depend on the profile: its own values are
+    included and marked as current by sensitivity_grid.
+    """
+    return [(feature, category) for feature in features for category in model['categories'][feature]]
+
+
+def sensitivity_grid(model, selected_profile, features=FEATURES):
+    """
+    Scores every single-attribute change of a profile in one batched pass:
+    each variant is a column of category codes per feature, so the logits of
+    all variants are gathered from the coefficient matrices at once. Returns
+    a long DataFrame with the mean probability over quarters per attribute,
+    value, year and province, and its change from the profile as selected.
+    """
+    variants = profile_variants(model, features)
+    attributes = np.array([feature for feature, _ in variants], dtype=object)
+    values = np.array([category for _, category in variants], dtype=object)
+
+    # Terms are summed in the order of score_profile so the unchanged
+    # profile gets exactly the probabilities of the results table.
+    logit = model['intercept'][:, None]
+    for feature in FEATURES:
+        codes = np.full(len(variants), model['index'][feature][selected_profile[feature]])
+        changed = attributes == feature
+        codes[changed] = [model['index'][feature][value] for value in values[changed]]
+        logit = logit + model['coefficients'][feature][:, codes]
+    logit = logit[:, :, None, None] + model['coefficients']['Province'][:, None, :, None]
+    logit = logit + model['coefficients']['Quarter'][:, None, None, :]
+    probabilities = logistic_percent(logit).mean(axis=3)
+
+    current = np.array([selected_profile[feature] == value for feature, value in variants])
+    current_variant = {attributes[i]: i for i in np.flatnonzero(current)}
+    baseline = probabilities[:, [current_variant[attribute] for attribute in attributes]]
+    change = probabilities - baseline
+
+    n_years, n_variants, n_provinces = probabilities.shape
+    grid = pd.DataFrame({
+        'Attribute': np.tile(np.repeat(attributes, n_provinces), n_years),
+        'Value': np.tile(np.repeat(values, n_provinces), n_years),
+        'Current': np.tile(np.repeat(current, n_provinces), n_years),
+        'Year': np.repeat(model['years'], n_variants * n_provinces),
+        'Province': np.tile(model['categories']['Province'], n_years * n_variants),
+        'Probability': probabilities.reshape(-1),
+        'Change': change.reshape(-1),
+    })
+    return grid
+
+
+def sensitivity_summary(grid, year='All', province='All'):
+    """
+    Averages a sensitivity grid over the years and provinces selected ('All'
+    for every one) into one row per attribute value.
+    """
+    rows = grid
+    if year != 'All':
+        rows = rows[rows['Year'] == year]
+    if province != 'All':
+        rows = rows[rows['Province'] == province]
+    summary = rows.groupby(['Attribute', 'Value', 'Current'], sort=False)[['Probability', 'Change']].mean()
+    return summary.round(2).reset_index()
@@ -0,0 +1,233 @@
+import argparse
+import asyncio
+import functools
+import json
+import threading
+from collections import OrderedDict
+
+from coefficient_store import load_model
+from scoring import FEATURES, score_profile, results_records
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed'}
+
+
+def normalize_profile(model, profile):
+    """
+    Returns the profile as a tuple in FEATURES order, raising ValueError for
+    missing attributes or categories the model does not know.
+    """
+    if not isinstance(profile, dict):
+        raise ValueError("A profile must be a JSON object")
+    key = []
+    for feature in FEATURES:
+        if feature not in profile:
+            raise ValueError(f"Profile is missing {feature}")
+        category = str(profile[feature]).strip()
+        if category not in model['index'][feature]:
+            raise ValueError(f"Unknown {feature} value: {category}")
+        key.append(category)
+    return tuple(key)
+
+
+def make_scorer(csv_path, cache_size):
+    """
+    Returns a function that scores a normalized profile tuple to its encoded
+    JSON result. Results are kept in a bounded LRU cache keyed by the profile
+    and the hash of the coefficients, so a changed CSV never serves stale
+    results. The returned function can be called from worker threads;
+    cached() on it returns a result only if it is already cached,
+    in_flight() and finish() track the results being scored, and
+    cache_info() reports hits, misses (profiles actually scored), coalesced
+    lookups (that waited for a result already being scored) and size.
+    """
+    cache = OrderedDict()
+    lock = threading.Lock()
+    stats = {'hits': 0, 'misses': 0, 'coalesced': 0}
+    # Futures of the results being scored, only used on the event loop
+    pending = {}
+
+    def cached(source_sha256, profile_key):
+        key = (source_sha256, profile_key)
+        with lock:
+            result = cache.get(key)
+            if result is None:
+                return None
+            cache.move_to_end(key)
+            stats['hits'] += 1
+            return result
+
+    def in_flight(source_sha256, profile_key):
+        """
+        Returns the future of the result being scored for the key and whether
+        this call created it, in which case the caller has to score the
+        profile and finish() it.
+        """
+        key = (source_sha256, profile_key)
+        future = pending.get(key)
+        if future is not None:
+            with lock:
+                stats['coalesced'] += 1
+            return future, False
+        future = pending[key] = asyncio.get_running_loop().create_future()
+        return future, True
+
+    def finish(source_sha256, profile_key, result=None, error=None):
+        future = pending.pop((source_sha256, profile_key))
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+            # Marks the error as seen; requests waiting on it still raise it
+            future.exception()
+        else:
+            future.set_result(result)
+
+    def score(source_sha256, profile_key):
+        model = load_model(csv_path)
+        profile = dict(zip(FEATURES, profile_key))
+        result = json.dumps({
+            'profile': profile,
+            'results': results_records(model, score_profile(model, profile)),
+        }).encode()
+        with lock:
+            stats['misses'] += 1
+            cache[(source_sha256, profile_key)] = result
+            while len(cache) > cache_size:
+                cache.popitem(last=False)
+        return result
+
+    def cache_info():
+        with lock:
+            return dict(stats, size=len(cache), max_size=cache_size, in_flight=len(pending))
+
+    score.cached = cached
+    score.in_flight = in_flight
+    score.finish = finish
+    score.cache_info = cache_info
+    return score
+
+
+async def score_keys(score, source_sha256, keys):
+    """
+    Returns the encoded results for normalized profile keys. Cached results
+    are answered on the event loop. A profile that another request is already
+    scoring is awaited rather than scored again; the remaining misses are
+    scored together in the default executor so that they never block other
+    connections.
+    """
+    parts = [score.cached(source_sha256, key) for key in keys]
+    futures = {}
+    started = []
+    for key, part in zip(keys, parts):
+        if part is None and key not in futures:
+            futures[key], owner = score.in_flight(source_sha256, key)
+            if owner:
+                started.append(key)
+    if not futures:
+        return parts
+
+    if started:
+        loop = asyncio.get_running_loop()
+        try:
+            scored = await loop.run_in_executor(
+                None, lambda: {key: score(source_sha256, key) for key in started}
+            )
+        except BaseException as e:
+            # Requests waiting on these profiles fail with the same error
+            error = e if isinstance(e, Exception) else RuntimeError("Scoring was cancelled")
+            for key in started:
+                score.finish(source_sha256, key, error=error)
+            raise
+        for key in started:
+            score.finish(source_sha256, key, scored[key])
+
+    done = {key: await future for key, future in futures.items()}
+    return [done[key] if part is None else part for key, part in zip(keys, parts)]
+
+
+async def handle_request(csv_path, score, method, path, body):
+    """
+    Routes one request and returns (status, response body bytes).
+    """
+    if path == '/stats':
+        return 200, json.dumps(score.cache_info()).encode()
+    if path not in ('/score', '/score/batch'):
+        return 404, json.dumps({'error': f"No route for {path}"}).encode()
+    if method != 'POST':
+        return 405, json.dumps({'error': "Use POST"}).encode()
+
+    model = load_model(csv_path)
+    try:
+        payload = json.loads(body or b'null')
+        if path == '/score':
+            keys = [normalize_profile(model, payload)]
+        elif not isinstance(payload, dict) or not isinstance(payload.get('profiles'), list):
+            raise ValueError("Batch requests need a 'profiles' list")
+        else:
+            keys = [normalize_profile(model, p) for p in payload['profiles']]
+    except ValueError as e:
+        return 400, json.dumps({'error': str(e)}).encode()
+    parts = await score_keys(score, model['source_sha256'], keys)
+    if path == '/score':
+        return 200, parts[0]
+    return 200, b'{"results": [' + b', '.join(parts) + b']}'
+
+
+async def handle_connection(csv_path, score, reader, writer):
+    """
+    Serves HTTP/1.1 requests on one keep-alive connection.
+    """
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line.strip():
+                break
+            method, path, _ = request_line.decode('latin-1').split(' ', 2)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get('content-length', 0)))
+
+            status, response = await handle_request(csv_path, score, method, path.split('?')[0], body)
+            writer.write(
+                f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(response)}\r\n\r\n".encode('latin-1') + response
+            )
+            await writer.drain()
+            if headers.get('connection', '').lower() == 'close':
+                break
+    except (asyncio.IncompleteReadError, ConnectionResetError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host, port, csv_path, cache_size):
+    load_model(csv_path)
+    score = make_scorer(csv_path, cache_size)
+    server = await asyncio.start_server(
+        functools.partial(handle_connection, csv_path, score), host, port, backlog=1024
+    )
+    print(f"Scoring service listening on http://{host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve profile probabilities as JSON over HTTP.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--coefficients', default='Book2.csv')
+    parser.add_argument('--cache-size', type=int, default=4096,
+                        help="Maximum number of profiles kept in the LRU cache")
+    args = parser.parse_args()
+    asyncio.run(serve(args.host, args.port, args.coefficients, args.cache_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import numpy as np
+
+from coefficient_store import load_model
+from scoring import FEATURES
+
+
+async def request(reader, writer, host, path, payload):
+    body = json.dumps(payload).encode()
+    writer.write(
+        f"POST {path} HTTP/1.1\r\nHost: {host}\r\n"
+        f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body
+    )
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def client(host, port, profiles, n_requests, batch_size, latencies, rng):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for _ in range(n_requests):
+            if batch_size > 1:
+                path, payload = '/score/batch', {'profiles': rng.sample(profiles, batch_size)}
+            else:
+                path, payload = '/score', rng.choice(profiles)
+            start = time.perf_counter()
+            status = await request(reader, writer, host, path, payload)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                raise RuntimeError(f"{path} returned HTTP {status}")
+    finally:
+        writer.close()
+
+
+async def run(host, port, csv_path, clients, n_requests, n_profiles, batch_size, seed):
+    model = load_model(csv_path)
+    rng = random.Random(seed)
+    profiles = [
+        {f: rng.choice(model['categories'][f]) for f in FEATURES}
+        for _ in range(n_profiles)
+    ]
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        client(host, port, profiles, n_requests, batch_size, latencies, random.Random(seed + i))
+        for i in range(clients)
+    ))
+    elapsed = time.perf_counter() - start
+
+    ms = np.array(latencies) * 1000
+    print(f"{len(ms):,} requests from {clients} clients in {elapsed:.2f}s "
+          f"({len(ms) / elapsed:,.0f} req/s)")
+    for q in (50, 90, 99, 99.9):
+        print(f"p{q}: {np.percentile(ms, q):.2f} ms")
+    print(f"max: {ms.max():.2f} ms")
+
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f"GET /stats HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode())
+    await writer.drain()
+    print("cache:", (await reader.read()).split(b'\r\n\r\n', 1)[1].decode())
+    writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate concurrent load against service.py.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--coefficients', default='Book2.csv',
+                        help="Coefficient CSV used to draw valid profiles")
+    parser.add_argument('--clients', type=int, default=200)
+    parser.add_argument('--requests', type=int, default=50, help="Requests per client")
+    parser.add_argument('--profiles', type=int, default=1000,
+                        help="Number of distinct profiles to draw requests from")
+    parser.add_argument('--batch-size', type=int, default=1,
+                        help="Profiles per request; values above 1 use /score/batch")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    asyncio.run(run(args.host, args.port, args.coefficients, args.clients, args.requests,
+                    args.profiles, args.batch_size, args.seed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import argparse
+import os
+import subprocess
+import sys
+
+
+def import_times(module):
+    """
+    Imports a module in a fresh interpreter with -X importtime and returns
+    (package, self microseconds, cumulative microseconds) for every import.
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, package = line[len('import time:'):].split('|')
+        rows.append((package.rstrip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def report(module, top=15):
+    """
+    Prints the total import time of a module and the top-level packages it
+    pulls in, slowest first.
+    """
+    rows = import_times(module)
+    top_level = [(package.strip(), cumulative) for package, _, cumulative in rows
+                 if not package.startswith('  ')]
+    total = next(cumulative for package, cumulative in top_level if package == module)
+    print(f"{module}: {total / 1000:.1f} ms to import")
+
+    by_root = {}
+    for package, _, cumulative in rows:
+        # Direct children of the module are indented by exactly two spaces.
+        depth = (len(package) - len(package.lstrip())) // 2
+        if depth == 1:
+            root = package.strip().split('.')[0]
+            by_root[root] = by_root.get(root, 0) + cumulative
+    for root, cumulative in sorted(by_root.items(), key=lambda item: -item[1])[:top]:
+        print(f"  {root:<30}{cumulative / 1000:>10.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report import time per module for the apps.")
+    parser.add_argument('modules', nargs='*', default=['app', 'app2', 'ma'])
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+    for module in args.modules:
+        report(module.removesuffix('.py'), args.top)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from fit_models import MONTH_QUARTERS, REFERENCES, design_matrix, feature_levels, fit_year, year_cells
+from lfs_ingest import partition_path, write_year
+
+sm = pytest.importorskip('statsmodels.api')
+
+YEAR = 2020
+
+# Model feature -> (LFS variable, non-reference categories)
+VARIABLES = {
+    'Province': ('PROV', ['Ontario', 'Quebec']),
+    'Age': ('AGE_12', ['25 to 29 years', '40 to 44 years']),
+    'Gender': ('SEX', ['Male']),
+    'MarStat': ('MARSTAT', ['Married', 'Single, never married']),
+    'Educ': ('EDUC', ['Bachelor\'s degree']),
+    'Inmig': ('IMMIG', ['Immigrant, landed 10 or less years earlier']),
+    'NOC': ('NOC_10', ['Sales and service occupations', 'Trades, transport and equipment operators']),
+}
+STATUS = {1: 'Employed, at work', 2: 'Employed, absent from work', 3: 'Unemployed', 4: 'Not in labour force'}
+
+
+@pytest.fixture(scope='module')
+def lfs_root(tmp_path_factory):
+    """
+    Writes one synthetic LFS year whose employment follows a logit in the
+    model features, and returns the partition root and its labelled rows.
+    """
+    rng = np.random.default_rng(0)
+    n = 5000
+    root = str(tmp_path_factory.mktemp('lfs'))
+
+    labels = {'LFSSTAT': STATUS, 'SURVMNTH': dict(enumerate(MONTH_QUARTERS, start=1))}
+    codes = {}
+    logit = np.full(n, -0.5)
+    for feature, (variable, categories) in VARIABLES.items():
+        labels[variable] = dict(enumerate([REFERENCES[feature]] + categories, start=1))
+        codes[variable] = rng.integers(1, len(labels[variable]) + 1, n).astype(np.int8)
+        effects = rng.normal(0, 0.6, len(labels[variable]))
+        effects[0] = 0.0
+        logit += effects[codes[variable] - 1]
+    codes['SURVMNTH'] = rng.integers(1, 13, n).astype(np.int8)
+    logit += np.array([0.0, 0.2, -0.1, 0.3])[(codes['SURVMNTH'] - 1) // 3]
+
+    employed = rng.random(n) < 1 / (1 + np.exp(-logit))
+    codes['LFSSTAT'] = np.where(employed, rng.integers(1, 3, n), rng.integers(3, 5, n)).astype(np.int8)
+    write_year(pd.DataFrame(codes), labels, partition_path(root, YEAR))
+
+    rows = pd.DataFrame({
+        feature: pd.Series(codes[variable]).map(labels[variable])
+        for feature, (variable, _) in VARIABLES.items()
+    })
+    rows['Quarter'] = pd.Series(codes['SURVMNTH']).map(labels['SURVMNTH']).map(MONTH_QUARTERS)
+    rows['Has_a_job'] = employed.astype(np.float64)
+    return root, rows
+
+
+def test_year_cells_count_every_row(lfs_root):
+    root, rows = lfs_root
+    cells = year_cells(root, YEAR)
+
+    assert cells['n_total'].sum() == len(rows)
+    assert cells['n_employed'].sum() == rows['Has_a_job'].sum()
+    features = [col for col in cells.columns if col not in ('n_employed', 'n_total')]
+    assert not cells.duplicated(features).any()
+
+
+def test_cell_fit_matches_row_level_fit(lfs_root):
+    root, rows = lfs_root
+    fit = fit_year(root, YEAR)
+
+    X, names = design_matrix(rows, feature_levels(rows))
+    expected = sm.GLM(rows['Has_a_job'].to_numpy(), X, family=sm.families.Binomial()).fit()
+
+    assert fit['converged']
+    assert fit['nobs'] == len(rows)
+    assert fit['levels'] == feature_levels(rows)
+    assert fit['intercept'] == pytest.approx(expected.params[0], abs=1e-8)
+    np.testing.assert_allclose([fit['coefficients'][name] for name in names], expected.params[1:], atol=1e-8)
+    assert fit['log_likelihood'] == pytest.approx(expected.llf, rel=1e-10)
@@ -0,0 +1,115 @@
+import itertools
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from coefficient_store import load_model
+from scoring import FEATURES, build_results, load_coefficient_data, results_frame, score_profile, score_profiles
+
+
+# The per-row scoring loop the apps shipped with before the vectorized engine.
+def loop_coefficients(csv_path):
+    df = pd.read_csv(csv_path)
+    years = [col for col in df.columns if col.isdigit()]
+    coefficients_by_year = {}
+    for year in years:
+        coefficients = {
+            'Intercept': df[df['Base Category'] == 'Intercept'][year].iloc[0]
+        }
+        for base_category in df['Base Category'].unique():
+            if base_category != 'Intercept':
+                category_data = df[df['Base Category'] == base_category]
+                coefficients[base_category] = dict(zip(category_data['Categories'],
+                                                     category_data[year]))
+        coefficients_by_year[year] = coefficients
+    return coefficients_by_year
+
+
+def loop_probability(selected_profile, coefficients_by_year):
+    all_results = []
+    for year, coefficients in coefficients_by_year.items():
+        combinations = list(itertools.product(
+            coefficients['Province'].keys(),
+            coefficients['Quarter'].keys()
+        ))
+        for combo in combinations:
+            logit = coefficients['Intercept']
+            for feature, category in selected_profile.items():
+                logit += coefficients[feature][category]
+            logit += coefficients['Province'][combo[0]]
+            logit += coefficients['Quarter'][combo[1]]
+            probability = np.round((np.exp(logit) / (1 + np.exp(logit))) * 100, 2)
+            all_results.append({
+                'Year': year,
+                'Province': combo[0],
+                'Quarter': combo[1],
+                'Probability': probability
+            })
+
+    results_df = pd.DataFrame(all_results).sort_values(by=['Year', 'Probability'], ascending=[True, False])
+    return results_df
+
+
+@pytest.fixture(scope='module')
+def book2(tmp_path_factory):
+    # A copy, so the compiled store is written outside the repository
+    path = tmp_path_factory.mktemp('coefficients') / 'Book2.csv'
+    shutil.copy('Book2.csv', path)
+    return str(path)
+
+
+@pytest.fixture(scope='module')
+def model(book2):
+    return load_model(book2)
+
+
+def profiles(model, n=20, seed=0):
+    rng = np.random.default_rng(seed)
+    categories = model['categories']
+    chosen = [
+        {feature: categories[feature][0] for feature in FEATURES},
+        {feature: categories[feature][-1] for feature in FEATURES},
+    ]
+    for _ in range(n - len(chosen)):
+        chosen.append({feature: categories[feature][rng.integers(len(categories[feature]))]
+                       for feature in FEATURES})
+    return chosen
+
+
+def by_cell(df):
+    return df.sort_values(['Year', 'Province', 'Quarter']).reset_index(drop=True)
+
+
+def test_results_frame_matches_row_loop(book2, model):
+    coefficients_by_year = loop_coefficients(book2)
+    for profile in profiles(model):
+        expected = loop_probability(profile, coefficients_by_year)
+        actual = results_frame(model, score_profile(model, profile))
+
+        assert len(actual) == len(expected)
+        pd.testing.assert_frame_equal(by_cell(actual), by_cell(expected), check_dtype=False)
+        # Same year order and descending probability within each year; only
+        # the order of tied probabilities may differ from the loop's sort.
+        assert list(actual['Year']) == list(expected['Year'])
+        np.testing.assert_array_equal(actual['Probability'].to_numpy(), expected['Probability'].to_numpy())
+
+
+def test_load_coefficient_data_matches_csv(book2):
+    assert load_coefficient_data(book2) == loop_coefficients(book2)
+
+
+def test_score_profiles_matches_score_profile(model):
+    batch = profiles(model)
+    scored = score_profiles(model, batch)
+    for profile, probabilities in zip(batch, scored):
+        np.testing.assert_array_equal(probabilities, score_profile(model, profile))
+
+
+def test_build_results_table_matches_results_frame(model):
+    profile = profiles(model)[2]
+    probabilities = score_profile(model, profile)
+    results = build_results(model, probabilities)
+    expected = results_frame(model, probabilities).reset_index(drop=True)
+    pd.testing.assert_frame_equal(results['table'].reset_index(drop=True), expected, check_dtype=False)
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+
+MAX_TREND_POINTS = 2000
+
+
+def period_labels(years, quarters):
+    """
+    Returns the 'YYYY-Qn' period labels in chronological order: years
+    sorted, then periods in their coefficient order.
+    """
+    return [f"{year}-{quarter}" for year in sorted(years) for quarter in quarters]
+
+
+def minmax_indices(values, n_buckets):
+    """
+    Min/max downsampling of the rows of a 2-D array: splits each row into
+    n_buckets consecutive buckets and keeps the positions of the smallest
+    and largest value of every bucket, plus the first and last point, in
+    order. Returns a boolean mask of the kept positions.
+    """
+    n_rows, n_points = values.shape
+    size = -(-n_points // n_buckets)
+    # Padding repeats the last point, so it never adds a new extreme.
+    padded = np.pad(values, ((0, 0), (0, n_buckets * size - n_points)), mode='edge')
+    buckets = padded.reshape(n_rows, n_buckets, size)
+    offsets = np.arange(n_buckets) * size
+
+    keep = np.zeros((n_rows, n_points), dtype=bool)
+    rows = np.arange(n_rows)[:, None]
+    keep[rows, np.minimum(buckets.argmin(axis=2) + offsets, n_points - 1)] = True
+    keep[rows, np.minimum(buckets.argmax(axis=2) + offsets, n_points - 1)] = True
+    keep[:, [0, n_points - 1]] = True
+    return keep
+
+
+def trend_frame(model, probabilities, max_points=MAX_TREND_POINTS):
+    """
+    Lays out a (years, provinces, quarters) probability tensor for the trend
+    graphs, one row per province and period in chronological order, with an
+    ordered categorical Period column. Returns the full series and a copy
+    for the 'All' view with at most about max_points points: when every
+    province together has more, each province's series is min/max
+    downsampled.
+    """
+    year_order = np.argsort(model['years'], kind='stable')
+    quarters = model['categories']['Quarter']
+    provinces = model['categories']['Province']
+    # (provinces, periods) in chronological order
+    series = probabilities[year_order].transpose(1, 0, 2).reshape(len(provinces), -1)
+    n_provinces, n_periods = series.shape
+
+    labels = period_labels(model['years'], quarters)
+    period_codes = np.tile(np.arange(n_periods), n_provinces)
+    year_labels = sorted(model['years'])
+    trend = pd.DataFrame({
+        'Province': pd.Categorical.from_codes(np.repeat(np.arange(n_provinces), n_periods), categories=provinces),
+        'Period': pd.Categorical.from_codes(period_codes, categories=labels, ordered=True),
+        'Year': pd.Categorical.from_codes(period_codes // len(quarters), categories=year_labels),
+        'Quarter': pd.Categorical.from_codes(period_codes % len(quarters), categories=quarters),
+        'Probability': series.reshape(-1),
+    })
+
+    if series.size <= max_points:
+        return trend, trend
+    n_buckets = max(1, max_points // (2 * n_provinces))
+    keep = minmax_indices(series, n_buckets)
+    return trend, trend[keep.reshape(-1)].reset_index(drop=True)
+
+
+def province_rows(trend, province):
+    """
+    Returns the rows of one province from a full trend frame, which holds
+    each province's periods consecutively.
+    """
+    n_periods = len(trend['Period'].cat.categories)
+    i = list(trend['Province'].cat.categories).index(province)
+    return trend.iloc[i * n_periods:(i + 1) * n_periods]